@@ -0,0 +1,235 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+
+import requests
+from requests.adapters import HTTPAdapter
+from reportlab.lib.utils import ImageReader
+
+from output_cache import file_digest
+
+# Per-user, so other accounts on the host can't plant cache entries
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+                                 'certificate_assets')
+
+
+class AssetResolver:
+    """Resolves signature/asset sources (URLs or local paths) to ImageReaders.
+
+    Remote assets go through a pooled requests session with timeouts, an
+    in-memory LRU of decoded ImageReader objects and an on-disk,
+    content-addressed cache. Disk entries younger than max_age are used
+    as-is; older ones are revalidated with If-None-Match/If-Modified-Since,
+    so each distinct URL is downloaded once per cache lifetime. The cache
+    directory is safe to share between pool workers; it is created 0700 and
+    a body whose sha256 doesn't match its name is treated as a miss.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_age=24 * 3600, timeout=(3.05, 15),
+                 memory_items=64, pool_size=10, session=None):
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self.timeout = timeout
+        self.memory_items = memory_items
+        self.pool_size = pool_size
+        self.session = session or self._new_session()
+        if cache_dir:
+            os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'memory_misses': 0, 'disk_hits': 0,
+                      'revalidated': 0, 'fetches': 0}
+
+    def _new_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def __getstate__(self):
+        # Pool workers get the settings and share the disk cache; the session,
+        # lock and in-memory images are per process
+        state = self.__dict__.copy()
+        for name in ('session', '_images', '_lock'):
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.session = self._new_session()
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def get_image(self, source):
+        """Return a (cached) ImageReader for a URL or local file path"""
+        # Local files are reloaded when their mtime or size changes; URLs keep
+        # the digest they were decoded from (see content_digest)
+        remote = source.startswith('http')
+        version = None if remote else _file_version(source)
+        with self._lock:
+            entry = self._images.get(source)
+            if entry is not None and (remote or entry[0] == version):
+                self._images.move_to_end(source)
+                self.stats['memory_hits'] += 1
+                return entry[1]
+            self.stats['memory_misses'] += 1
+
+        if remote:
+            content = self.fetch_bytes(source)
+            version = hashlib.sha256(content).hexdigest()
+            reader = ImageReader(BytesIO(content))
+        else:
+            reader = ImageReader(source)
+        reader.getRGBData()  # decode once here rather than on first draw
+
+        with self._lock:
+            self._images[source] = (version, reader)
+            self._images.move_to_end(source)
+            while len(self._images) > self.memory_items:
+                self._images.popitem(last=False)
+        return reader
+
+    def fetch_bytes(self, url):
+        """Return the body of url, from the disk cache when it is still valid"""
+        meta = self._load_meta(url)
+        cached = self._read_blob(meta['digest']) if meta else None
+
+        headers = {}
+        if cached is not None:
+            if time.time() - meta['fetched_at'] < self.max_age:
+                self._count('disk_hits')
+                return cached
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        self._count('fetches')
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException:
+            if cached is not None:
+                # Network trouble: a stale copy beats a missing signature
+                return cached
+            raise
+
+        if response.status_code == 304 and cached is not None:
+            self._count('revalidated')
+            meta['fetched_at'] = time.time()
+            self._save_meta(url, meta)
+            return cached
+
+        response.raise_for_status()
+        content = response.content
+        digest = hashlib.sha256(content).hexdigest()
+        self._write_blob(digest, content)
+        self._save_meta(url, {
+            'url': url,
+            'digest': digest,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': time.time(),
+        })
+        return content
+
+    def content_digest(self, source):
+        """sha256 of the current contents of a URL or local file (None if the file is missing).
+
+        URLs are revalidated like fetch_bytes does; a decoded copy in memory
+        that no longer matches is dropped, so the next get_image reloads it.
+        """
+        if not source.startswith('http'):
+            return file_digest(source)
+        content = self.fetch_bytes(source)
+        meta = self._load_meta(source)
+        digest = meta['digest'] if meta else hashlib.sha256(content).hexdigest()
+        with self._lock:
+            entry = self._images.get(source)
+            if entry is not None and entry[0] != digest:
+                del self._images[source]
+        return digest
+
+    def clear_memory(self):
+        with self._lock:
+            self._images.clear()
+
+    # Disk cache layout:
+    #   <cache_dir>/urls/<sha256(url)>.json     - etag, last_modified, digest
+    #   <cache_dir>/objects/<dd>/<sha256(body)> - response bodies
+
+    def _meta_path(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, 'urls', key + '.json')
+
+    def _blob_path(self, digest):
+        return os.path.join(self.cache_dir, 'objects', digest[:2], digest)
+
+    def _load_meta(self, url):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._meta_path(url), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_meta(self, url, meta):
+        if self.cache_dir:
+            _atomic_write(self._meta_path(url), json.dumps(meta).encode('utf-8'))
+
+    def _read_blob(self, digest):
+        try:
+            with open(self._blob_path(digest), 'rb') as f:
+                content = f.read()
+        except OSError:
+            return None
+        # Corrupt or tampered with: refetch rather than trust it
+        return content if hashlib.sha256(content).hexdigest() == digest else None
+
+    def _write_blob(self, digest, content):
+        if not self.cache_dir:
+            return
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            _atomic_write(path, content)
+
+
+def _file_version(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None  # let ImageReader raise the real error
+    return st.st_mtime_ns, st.st_size
+
+
+def is_transient_error(error):
+    """True for failures worth retrying: connection errors, timeouts and 5xx responses"""
+    if isinstance(error, requests.HTTPError):
+        return error.response is None or error.response.status_code >= 500
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+
+def _atomic_write(path, content):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
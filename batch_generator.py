@@ -0,0 +1,189 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from asset_resolver import AssetResolver, is_transient_error
+from certificate_generator import CertificateGenerator, validate_record
+from instrumentation import Instrumentation
+from output_sinks import DirectorySink
+from signature_prefetch import prefetched
+
+# Generator owned by each pool worker; built once by _init_worker so the
+# fonts are registered (and images loaded) once per process, not per record
+_worker_generator = None
+
+
+def certificate_filename(data):
+    """Output file name for a record, same convention as test.py"""
+    if data.get('filename'):
+        return data['filename']
+    name = data.get('name') or 'certificate'
+    return f"{name.replace(' ', '_').lower()}_certificate.pdf"
+
+
+def _init_worker(generator_kwargs):
+    global _worker_generator
+    _worker_generator = CertificateGenerator(**generator_kwargs)
+
+
+def _output_name(index, data, preview):
+    name = certificate_filename(data) if isinstance(data, dict) else f"{index}.pdf"
+    if preview is not None:
+        name = os.path.splitext(name)[0] + '.' + preview.get('format', 'png')
+    return name
+
+
+def reserve_names(sink, records, start_index=0, preview=None):
+    """Claim the output names of records that won't be rendered (e.g. rows before a resume offset).
+
+    A resumed run then names the remaining records exactly as the full run
+    did, instead of giving a repeated name back to a later record.
+    """
+    for index, data in enumerate(records, start_index):
+        sink.reserve(_output_name(index, data, preview))
+
+
+def _render_record(generator, index, data, target, retries=0, backoff=1.0, preview=None, streaming=False):
+    # target is the output path, or for streaming sinks the member name; the
+    # rendered bytes are then returned as 'content' for the parent to store
+    instrumentation = generator.instrumentation
+    if instrumentation is not None:
+        instrumentation.begin_certificate()
+        counters_before = instrumentation.read_counters()
+    started = time.perf_counter()
+    attempts = 0
+    while True:
+        attempts += 1
+        try:
+            validate_record(data)
+            result = {'index': index, 'filename': target, 'ok': True, 'error': None}
+            if streaming:
+                if preview is not None:
+                    content = generator.render_preview_bytes(data, **preview)
+                else:
+                    content = generator.render_certificate_bytes(data)
+                result['content'] = content
+                result['size'] = len(content)
+            else:
+                if preview is not None:
+                    generator.create_preview(target, data, **preview)
+                else:
+                    generator.create_certificate(target, data)
+                result['size'] = os.path.getsize(target)
+            break
+        except Exception as e:
+            # Transient asset failures (network, 5xx) are retried with backoff
+            if attempts <= retries and is_transient_error(e):
+                time.sleep(backoff * 2 ** (attempts - 1))
+                continue
+            result = {'index': index, 'filename': target, 'ok': False, 'error': f"{type(e).__name__}: {e}"}
+            break
+    result['duration'] = time.perf_counter() - started
+    result['attempts'] = attempts
+    if instrumentation is not None:
+        # Per-record timings and counter deltas, for aggregation in the parent
+        counters = instrumentation.read_counters()
+        result['timings'] = dict(instrumentation.current)
+        result['counters'] = {name: value - counters_before.get(name, 0)
+                              for name, value in counters.items() if value != counters_before.get(name, 0)}
+    return result
+
+
+def _render_in_worker(index, data, target, retries, backoff, preview, streaming):
+    return _render_record(_worker_generator, index, data, target, retries, backoff, preview, streaming)
+
+
+def generate_batch(records, out_dir, workers=None, max_pending=None, generator_kwargs=None, start_index=0,
+                   stats=None, prefetch=False, prefetch_workers=8, retries=0, backoff=1.0, skip=None,
+                   preview=None, sink=None):
+    """Render many certificates across a process pool.
+
+    records can be any iterable of certificate data dicts; it is consumed
+    lazily, with at most max_pending records in flight at once. Yields one
+    result dict per record (index, filename, ok, error, duration, attempts)
+    in completion order. workers=1 renders in the calling process without a
+    pool. Result indices count from start_index, e.g. the row a resumed
+    input stream starts at; indices in skip are passed over.
+
+    A failing record only fails its own result. Errors that look transient
+    (network trouble, 5xx) are retried up to retries times with exponential
+    backoff.
+
+    Pass an Instrumentation as stats to instrument every worker; results then
+    carry per-record 'timings' and 'counters', aggregated into stats.
+
+    With prefetch=True the distinct remote signatures are downloaded by
+    prefetch_workers threads a window of records ahead of rendering. With
+    workers=1 they are decoded into the resolver's memory; pool workers
+    only share its disk cache, so there just the bytes are fetched and the
+    resolver must have a cache_dir.
+
+    preview, a dict of CertificateGenerator.create_preview options (width,
+    format, quality), renders thumbnails instead of PDFs, in the same pool.
+
+    Outputs go to a DirectorySink(out_dir), where a repeated name gets a
+    -1, -2, ... suffix instead of overwriting. sink (see output_sinks)
+    replaces it: sharded directories, or a ZIP/TAR archive that workers
+    stream their bytes into via the parent. The caller closes a sink it
+    passes in.
+    """
+    if sink is None:
+        sink = DirectorySink(out_dir)
+    generator_kwargs = generator_kwargs or {}
+    workers = workers or os.cpu_count() or 1
+    # Names are reserved in input order, skipped records included, so a
+    # resumed run hands out the same names as the first one
+    indexed_records = ((index, data, sink.reserve(_output_name(index, data, preview)))
+                       for index, data in enumerate(records, start_index))
+    if skip:
+        indexed_records = (item for item in indexed_records if item[0] not in skip)
+    if prefetch:
+        resolver = generator_kwargs.get('asset_resolver') or AssetResolver()
+        if workers > 1 and not resolver.cache_dir:
+            raise ValueError("prefetch with worker processes needs an AssetResolver with a cache_dir")
+        generator_kwargs = dict(generator_kwargs, asset_resolver=resolver)
+        indexed_records = prefetched(indexed_records, resolver, max_workers=prefetch_workers,
+                                     record=lambda item: item[1], decode=workers == 1)
+    if stats is not None:
+        generator_kwargs = dict(generator_kwargs, instrumentation=Instrumentation())
+        results = _generate(indexed_records, workers, max_pending, generator_kwargs, retries, backoff,
+                            preview, sink)
+        for result in results:
+            stats.merge_record(result['timings'], result['counters'])
+            yield result
+        return
+    yield from _generate(indexed_records, workers, max_pending, generator_kwargs, retries, backoff,
+                         preview, sink)
+
+
+def _generate(indexed_records, workers, max_pending, generator_kwargs, retries, backoff, preview, sink):
+    streaming = sink.streaming
+
+    def finish(result):
+        # Streaming sinks get the bytes here, in the parent, one record at a time
+        content = result.pop('content', None)
+        if content is not None:
+            result['filename'] = sink.write(result['filename'], content)
+        return result
+
+    if workers == 1:
+        generator = CertificateGenerator(**generator_kwargs)
+        for index, data, target in indexed_records:
+            yield finish(_render_record(generator, index, data, target, retries, backoff, preview, streaming))
+        return
+
+    max_pending = max_pending or workers * 4
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(generator_kwargs,)) as pool:
+        pending = set()
+        for index, data, target in indexed_records:
+            pending.add(pool.submit(_render_in_worker, index, data, target, retries, backoff, preview,
+                                    streaming))
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield finish(future.result())
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield finish(future.result())
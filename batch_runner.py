@@ -0,0 +1,85 @@
+import json
+import os
+
+from batch_generator import generate_batch
+
+
+class Manifest:
+    """Append-only JSONL log of what happened to each record of a batch.
+
+    Every result is written as one line (index, status, output, size,
+    duration, attempts, error) and flushed, so the log survives the run
+    being killed. On reopening, records whose latest entry is 'done' and
+    whose output file still exists make up `done`, which a rerun skips.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = self._load()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def _load(self):
+        latest = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                text = f.read()
+        except FileNotFoundError:
+            return set()
+        if text and not text.endswith('\n'):
+            # The last line was cut off mid-write; terminate it so it stays unparsable
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write('\n')
+        for line in text.splitlines():
+            try:
+                entry = json.loads(line)
+                latest[entry['index']] = entry
+            except (ValueError, KeyError, TypeError):
+                continue
+        return {index for index, entry in latest.items()
+                if entry.get('status') == 'done' and os.path.exists(entry.get('output') or '')}
+
+    def record(self, result):
+        entry = {
+            'index': result['index'],
+            'status': 'done' if result['ok'] else 'failed',
+            'output': result['filename'] if result['ok'] else None,
+            'size': result.get('size') if result['ok'] else None,
+            'duration': round(result['duration'], 6),
+            'attempts': result.get('attempts', 1),
+            'error': result['error'],
+        }
+        self._file.write(json.dumps(entry) + '\n')
+        self._file.flush()
+        if result['ok']:
+            self.done.add(result['index'])
+        return entry
+
+    def close(self):
+        self._file.close()
+
+
+def run_batch(records, out_dir, manifest, retries=2, backoff=1.0, strict_signatures=True,
+              generator_kwargs=None, **batch_kwargs):
+    """Fault-tolerant generate_batch: every record is isolated and logged to a manifest.
+
+    A bad record only fails its own manifest entry; transient asset errors
+    are retried, and with strict_signatures a signature that cannot be
+    loaded fails the record rather than shipping a certificate without it.
+    Outputs are written atomically. Rerunning with the same manifest skips
+    the records already done. manifest is a path or an open Manifest.
+    Outputs must be files, so archive sinks are rejected. Yields the
+    generate_batch results.
+    """
+    sink = batch_kwargs.get('sink')
+    if sink is not None and sink.streaming:
+        raise ValueError("run_batch can't resume into an archive; use a directory sink")
+    generator_kwargs = dict(generator_kwargs or {}, strict_signatures=strict_signatures)
+    if not isinstance(manifest, Manifest):
+        manifest = Manifest(manifest)
+    try:
+        for result in generate_batch(records, out_dir, generator_kwargs=generator_kwargs, retries=retries,
+                                     backoff=backoff, skip=set(manifest.done), **batch_kwargs):
+            manifest.record(result)
+            yield result
+    finally:
+        manifest.close()
@@ -0,0 +1,228 @@
+"""Certificate rendering benchmarks.
+
+Runs each mode in a fresh process against local fixture assets (no network),
+and reports certificates/second, per-certificate latency percentiles, peak RSS
+and output bytes per certificate as JSON. Throughput covers each mode's whole
+run including its start-up (generator construction, cache fingerprinting,
+pool start), so modes compare like for like; use enough records to amortize
+it. Save a run and compare later runs against it to catch regressions:
+
+    python benchmark.py --records 200 --output baseline.json
+    python benchmark.py --records 200 --compare baseline.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ('single', 'batch', 'parallel', 'cached')
+
+SAMPLE_VALUE = ('has successfully completed WorkTRADE, an online training module on the Prevention of Insider '
+                'Trading in India covering the Securities and Exchange Board of India (SEBI) Regulations. By '
+                'completing this training module, you have demonstrated your dedication to upholding ethical '
+                'standards in the financial markets and preventing the misuse of confidential information. Your '
+                'commitment to compliance and integrity is commendable.')
+
+# Bigger is better for these; everything else is a cost
+HIGHER_IS_BETTER = ('certs_per_sec',)
+
+
+def make_fixture_signature(directory):
+    """Write a deterministic signature PNG, standing in for the S3 one"""
+    from PIL import Image, ImageDraw
+    path = os.path.join(directory, 'signature.png')
+    image = Image.new('RGBA', (360, 120), (255, 255, 255, 0))
+    draw = ImageDraw.Draw(image)
+    draw.line([(12, 96), (90, 30), (150, 88), (230, 24), (340, 70)], fill=(20, 30, 90, 255), width=5)
+    image.save(path)
+    return path
+
+
+def make_records(count, signature_path):
+    return [{
+        'course_title': 'Certificate of Completion',
+        'course_sub': 'Welcome!',
+        'name': f'Learner Number {i}',
+        'value': SAMPLE_VALUE,
+        'date': '09-09-2023',
+        'ceo_signature': signature_path,
+        'ceo_name': 'Antony Alex',
+        'ceo_title': 'CEO - Rainmaker',
+    } for i in range(count)]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def _ms(seconds):
+    return seconds * 1000 if seconds is not None else None
+
+
+def summarize(latencies, elapsed, output_bytes, count):
+    latencies = sorted(latencies)
+    return {
+        'records': count,
+        'elapsed_sec': elapsed,
+        'certs_per_sec': count / elapsed if elapsed else None,
+        'latency_p50_ms': _ms(percentile(latencies, 50)),
+        'latency_p95_ms': _ms(percentile(latencies, 95)),
+        'latency_p99_ms': _ms(percentile(latencies, 99)),
+        'bytes_per_cert': output_bytes / count if count else None,
+        # ru_maxrss is in KiB on Linux
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'peak_worker_rss_kb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    }
+
+
+def _output_bytes(directory):
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, dirs, files in os.walk(directory) for name in files)
+
+
+def run_mode(mode, count, workers, workdir):
+    from batch_generator import generate_batch
+    from certificate_generator import CertificateGenerator
+    from output_cache import OutputCache
+
+    records = make_records(count, make_fixture_signature(workdir))
+    out_dir = os.path.join(workdir, 'out')
+
+    if mode == 'single':
+        os.makedirs(out_dir)
+        latencies = []
+        # Timed from before construction, like generate_batch's internal generator
+        started = time.perf_counter()
+        generator = CertificateGenerator()
+        for i, data in enumerate(records):
+            t = time.perf_counter()
+            generator.create_certificate(os.path.join(out_dir, f'{i}.pdf'), data)
+            latencies.append(time.perf_counter() - t)
+        elapsed = time.perf_counter() - started
+    else:
+        generator_kwargs = {}
+        if mode == 'cached':
+            generator_kwargs['output_cache'] = OutputCache(os.path.join(workdir, 'cache'))
+            # Warm the cache; only the fully cached rerun is measured
+            list(generate_batch(records, os.path.join(workdir, 'warm'), workers=1, generator_kwargs=generator_kwargs))
+        started = time.perf_counter()
+        results = list(generate_batch(records, out_dir, workers=workers if mode == 'parallel' else 1,
+                                      generator_kwargs=generator_kwargs))
+        elapsed = time.perf_counter() - started
+        failed = [r for r in results if not r['ok']]
+        if failed:
+            raise RuntimeError(f"{len(failed)} certificates failed, first: {failed[0]['error']}")
+        latencies = [r['duration'] for r in results]
+
+    result = summarize(latencies, elapsed, _output_bytes(out_dir), count)
+    result['workers'] = workers if mode == 'parallel' else 1
+    return result
+
+
+def _child(mode, count, workers, queue):
+    # Keep the per-certificate prints of this process and its pool out of the report
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    workdir = tempfile.mkdtemp(prefix=f'cert-bench-{mode}-')
+    try:
+        queue.put(run_mode(mode, count, workers, workdir))
+    except Exception as e:
+        queue.put({'error': f"{type(e).__name__}: {e}"})
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_isolated(mode, count, workers):
+    """Run one mode in a fresh process so peak RSS and warm caches don't leak between modes"""
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    process = ctx.Process(target=_child, args=(mode, count, workers, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def environment():
+    import reportlab
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'reportlab': reportlab.Version,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(current, baseline, threshold):
+    """Return human-readable regressions of current vs baseline beyond threshold (a fraction)"""
+    regressions = []
+    for mode, result in current['results'].items():
+        base = baseline.get('results', {}).get(mode)
+        if not base or 'error' in result or 'error' in base:
+            continue
+        for metric in ('certs_per_sec', 'latency_p50_ms', 'latency_p95_ms', 'latency_p99_ms',
+                       'bytes_per_cert', 'peak_rss_kb'):
+            new, old = result.get(metric), base.get(metric)
+            if not new or not old:
+                continue
+            change = (new - old) / old
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            if worse > threshold:
+                regressions.append(f"{mode}.{metric}: {old:.2f} -> {new:.2f} ({change:+.1%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark certificate rendering")
+    parser.add_argument('--records', type=int, default=100, help="certificates per mode")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="workers for parallel mode")
+    parser.add_argument('--modes', default=','.join(MODES), help=f"comma-separated subset of {','.join(MODES)}")
+    parser.add_argument('--output', help="write the JSON results to this file")
+    parser.add_argument('--compare', help="baseline JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10, help="allowed regression fraction (default 0.10)")
+    args = parser.parse_args(argv)
+    if args.records < 1:
+        parser.error("--records must be at least 1")
+
+    report = {'environment': environment(), 'results': {}}
+    for mode in args.modes.split(','):
+        if mode not in MODES:
+            parser.error(f"unknown mode: {mode}")
+        report['results'][mode] = run_isolated(mode, args.records, args.workers)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    print(text)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+from itertools import islice
+
+from batch_generator import generate_batch, reserve_names
+from batch_runner import Manifest, run_batch
+from output_sinks import DirectorySink, is_archive, open_sink
+
+
+def detect_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if ext == '.csv':
+        return 'csv'
+    raise ValueError(f"cannot tell input format from {path!r}; pass fmt='csv' or fmt='jsonl'")
+
+
+def iter_records(path, fmt=None, start=0):
+    """Stream certificate records from a CSV or JSONL file, one dict at a time.
+
+    Rows before start are skipped without being kept in memory (for JSONL
+    without being parsed), so resuming deep into a large export is cheap.
+    Blank JSONL lines are not counted as rows. A line that isn't valid JSON
+    is yielded as the ValueError describing it, so it fails only its own
+    row (validate_record raises it).
+    """
+    fmt = fmt or detect_format(path)
+    # utf-8-sig: spreadsheet and LMS exports often start with a byte order mark
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        if fmt == 'csv':
+            for row, record in enumerate(csv.DictReader(f)):
+                if row >= start:
+                    yield record
+        elif fmt == 'jsonl':
+            row = 0
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                if row >= start:
+                    try:
+                        yield json.loads(line)
+                    except ValueError as e:
+                        yield ValueError(f"line {line_number}: invalid JSON: {e}")
+                row += 1
+        else:
+            raise ValueError(f"unknown input format: {fmt!r}")
+
+
+class Checkpoint:
+    """Persists the row offset below which every record has been processed.
+
+    Results arrive out of order from the pool, so rows completed past the
+    first gap are held in a small set until the gap fills in. The file is
+    rewritten atomically every `every` completions and on close().
+    """
+
+    def __init__(self, path, every=100):
+        self.path = path
+        self.every = every
+        self.next_row = self._load()
+        self._done_ahead = set()
+        self._since_save = 0
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return int(json.load(f)['next_row'])
+        except FileNotFoundError:
+            return 0
+
+    def mark_done(self, row):
+        self._done_ahead.add(row)
+        while self.next_row in self._done_ahead:
+            self._done_ahead.remove(self.next_row)
+            self.next_row += 1
+        self._since_save += 1
+        if self._since_save >= self.every:
+            self.save()
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.checkpoint-')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'next_row': self.next_row}, f)
+        os.replace(tmp_path, self.path)
+        self._since_save = 0
+
+    def close(self):
+        self.save()
+
+
+def generate_from_file(path, out_dir, fmt=None, workers=None, checkpoint_path=None,
+                       start=None, generator_kwargs=None, manifest_path=None, retries=2, sink=None):
+    """Generate certificates for every record in a CSV/JSONL file.
+
+    Records are read lazily and fed into generate_batch, so memory stays flat
+    regardless of file size. With checkpoint_path, progress is saved as a row
+    offset and a rerun resumes from it; start overrides the saved offset.
+    With manifest_path, the run goes through run_batch instead: every row is
+    logged to the manifest, transient failures are retried and a rerun skips
+    the rows already done. sink (see output_sinks) replaces out_dir; an
+    archive sink can't be combined with checkpoint, start or manifest.
+    Resuming past row 0 reads the earlier rows once more, without rendering
+    them, so repeated names get the same suffixes as in a full run.
+    Yields generate_batch result dicts; 'index' is the row in the input file.
+    """
+    if sink is not None and sink.streaming and (checkpoint_path or start or manifest_path):
+        raise ValueError("checkpoint, start and manifest can't be used with an archive output: "
+                         "each run writes a new archive holding only that run's certificates")
+    checkpoint = Checkpoint(checkpoint_path) if checkpoint_path else None
+    if start is None:
+        start = checkpoint.next_row if checkpoint else 0
+    if checkpoint:
+        checkpoint.next_row = start
+
+    if sink is None:
+        sink = DirectorySink(out_dir)
+    if start:
+        # Rows before start keep their names, so repeats after it still get -1, -2, ...
+        reserve_names(sink, islice(iter_records(path, fmt=fmt), start))
+    records = iter_records(path, fmt=fmt, start=start)
+    if manifest_path:
+        manifest = Manifest(manifest_path)
+        if checkpoint:
+            # Rows the manifest skips produce no result; count them as processed
+            for row in sorted(manifest.done):
+                if row >= start:
+                    checkpoint.mark_done(row)
+        results = run_batch(records, out_dir, manifest, retries=retries, workers=workers,
+                            generator_kwargs=generator_kwargs, start_index=start, sink=sink)
+    else:
+        results = generate_batch(records, out_dir, workers=workers,
+                                 generator_kwargs=generator_kwargs, start_index=start, sink=sink)
+    try:
+        for result in results:
+            # With a manifest, failed rows are retried on rerun, so the offset must not pass them
+            if checkpoint and (result['ok'] or not manifest_path):
+                checkpoint.mark_done(result['index'])
+            yield result
+    finally:
+        if checkpoint:
+            checkpoint.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate certificates from a CSV or JSONL export")
+    parser.add_argument('input', help="CSV or JSONL file with one certificate record per row")
+    parser.add_argument('out_dir', help="directory to write the PDFs to, or a .zip/.tar/.tar.gz archive to stream them into")
+    parser.add_argument('--format', choices=('csv', 'jsonl'), help="input format (default: from file extension)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--checkpoint', help="file to save/resume the processed row offset")
+    parser.add_argument('--start', type=int, default=None, help="row offset to start from")
+    parser.add_argument('--manifest', help="JSONL manifest to log every row to; rerunning skips rows already done")
+    parser.add_argument('--retries', type=int, default=2, help="retries for transient failures with --manifest")
+    parser.add_argument('--sharded', action='store_true', help="spread PDFs over hashed subdirectories of out_dir")
+    args = parser.parse_args(argv)
+    if is_archive(args.out_dir) and (args.checkpoint or args.start or args.manifest):
+        parser.error("--checkpoint, --start and --manifest need a directory output, not an archive")
+
+    ok = failed = 0
+    with open_sink(args.out_dir, sharded=args.sharded) as sink:
+        for result in generate_from_file(args.input, args.out_dir, fmt=args.format, workers=args.workers,
+                                         checkpoint_path=args.checkpoint, start=args.start,
+                                         manifest_path=args.manifest, retries=args.retries, sink=sink):
+            if result['ok']:
+                ok += 1
+            else:
+                failed += 1
+                print(f"Row {result['index']} failed: {result['error']}", file=sys.stderr)
+    print(f"Done: {ok} certificates created, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
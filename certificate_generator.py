@@ -1,296 +1,428 @@
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfbase import pdfmetrics
-from reportlab.lib.colors import HexColor
 import os
-from datetime import datetime
-import requests
+import asyncio
+import hashlib
+import logging
+import time
 from io import BytesIO
+from datetime import datetime
+from asset_resolver import AssetResolver
+from image_assets import shared_registry
+from text_layout import string_width, truncate_text, wrap_text
+from output_cache import file_digest, write_atomically
+from font_registry import ensure_font, font_files
+from instrumentation import NO_STAGE
+from layout import DEFAULT_LAYOUT, get_plan, layout_hash, load_layout
+from preview import DEFAULT_WIDTH as DEFAULT_PREVIEW_WIDTH, render_preview
+
+# Asset paths resolve relative to this file, not the working directory
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Source files holding the drawing code; part of the output cache fingerprint
+LAYOUT_SOURCES = [os.path.abspath(__file__), os.path.join(BASE_DIR, 'text_layout.py'),
+                  os.path.join(BASE_DIR, 'image_assets.py'), os.path.join(BASE_DIR, 'layout.py')]
+
+logger = logging.getLogger(__name__)
+
+# Keys create_certificate reads from every record
+REQUIRED_FIELDS = ('course_title', 'course_sub', 'name', 'value', 'date', 'ceo_name', 'ceo_title')
+
+def validate_record(data):
+    """Raise ValueError if a certificate record is missing or has blank required fields"""
+    if isinstance(data, Exception):
+        raise data  # a row the input reader could not parse
+    if not isinstance(data, dict):
+        raise ValueError(f"record must be a mapping, not {type(data).__name__}")
+    missing = [key for key in REQUIRED_FIELDS
+               if data.get(key) is None or (isinstance(data[key], str) and not data[key].strip())]
+    if missing:
+        raise ValueError(f"missing required fields: {', '.join(missing)}")
 
 class CertificateGenerator:
-    def __init__(self):
-        # Decrease both width and height by 20px from A4 landscape
-        orig_width, orig_height = landscape(A4)
-        self.width = orig_width - 0
-        self.height = orig_height - 30
-        # A4 landscape: 841.89 x 595.27 points
-        
-        # Register EB Garamond font
-        try:
-            pdfmetrics.registerFont(TTFont('EBGaramond', os.path.join('font', 'EBGaramond-Regular.ttf')))
-            pdfmetrics.registerFont(TTFont('EBGaramond-Bold', os.path.join('font', 'EBGaramond-Bold.ttf')))
-            pdfmetrics.registerFont(TTFont('EBGaramond-Italic', os.path.join('font', 'EBGaramond-Italic.ttf')))
-            self.font_regular = 'EBGaramond'
-            self.font_bold = 'EBGaramond-Bold'
-            self.font_italic = 'EBGaramond-Italic'
-        except:
-            self.font_regular = 'EBGaramond'
-            self.font_bold = 'EBGaramond-Bold'
-            # Removed all Georgia font variables; only use EB Garamond fonts
+    def __init__(self, asset_resolver=None, image_registry=None, use_template=False, output_cache=None,
+                 instrumentation=None, image_dpi=None, image_quality=85, layouts=None,
+                 strict_signatures=False):
+        # Layout specs (dicts or JSON file paths) by template name; records pick
+        # one with 'template'. Each is validated and compiled once into a DrawPlan
+        self.layouts = {'default': DEFAULT_LAYOUT}
+        for name, spec in (layouts or {}).items():
+            self.layouts[name] = load_layout(spec) if isinstance(spec, str) else spec
+        self._plans = {}
+        plans = self._all_plans()
+        self.width = plans[0].width
+        self.height = plans[0].height
+
+        # EB Garamond faces are registered lazily, once per process, by font_registry
+        # Shared signature/asset fetching (pooled session, LRU + disk cache)
+        self.asset_resolver = asset_resolver or AssetResolver()
+        # Strict: a signature that fails to load fails the certificate instead of
+        # producing one without a signature
+        self.strict_signatures = strict_signatures
+
+        # Static images are decoded and PDF-encoded once per process, then reused by every
+        # certificate and generator. image_dpi resamples them to their drawn size (smaller PDFs)
+        self.images = image_registry or shared_registry(dpi=image_dpi, quality=image_quality)
+        self.images.preload(sorted({path for plan in plans for path in plan.images}))
+
+        # Template mode draws the invariant layers once per PDF as form XObjects
+        self.use_template = use_template
+
+        # Optional OutputCache: unchanged records are served from it instead of re-rendered
+        self.output_cache = output_cache
+        self._fingerprint = None
+
+        # Optional Instrumentation (stage timers, counters, hooks); None costs next to nothing
+        self.instrumentation = instrumentation
+        if instrumentation is not None:
+            instrumentation.add_source(lambda: _prefixed('signature_', self.asset_resolver.stats))
+            instrumentation.add_source(lambda: _prefixed('image_', self.images.stats))
+            if output_cache is not None:
+                instrumentation.add_source(lambda: {'output_cache_hits': output_cache.hits,
+                                                    'output_cache_misses': output_cache.misses})
     
+    @property
+    def font_regular(self):
+        return ensure_font('EBGaramond')
+
+    @property
+    def font_bold(self):
+        return ensure_font('EBGaramond-Bold')
+
+    @property
+    def font_italic(self):
+        return ensure_font('EBGaramond-Italic')
+
     def create_certificate(self, filename, data):
         """Create a certificate PDF with the given data matching the HTML design 100% exactly"""
+        if self.instrumentation is not None:
+            self.instrumentation.begin_certificate()
+        started = time.perf_counter()
+        key = self._cache_key(data) if self.output_cache is not None else None
+        if key is not None:
+            if self.output_cache.get_or_create(key, filename, lambda path: self._save_certificate(path, data)):
+                # A hit still counts as a certificate; its total is the lookup and placement
+                self._end_certificate(started)
+                print(f"Certificate reused: {filename}")
+            else:
+                print(f"Certificate created: {filename}")
+            return
+
+        write_atomically(filename, lambda path: self._save_certificate(path, data))
+        print(f"Certificate created: {filename}")
+
+    def _cache_key(self, data):
+        """Output cache key for a record, or None if its signature can't be resolved"""
+        # The signature is keyed by its content, not its path or URL, so a
+        # replaced image is rendered afresh
+        signature = None
+        if data.get('ceo_signature'):
+            try:
+                signature = self.asset_resolver.content_digest(data['ceo_signature'])
+            except Exception:
+                return None  # render uncached; drawing reports the error
+        return self.output_cache.key(data, f"{self.fingerprint()}\n{signature}")
+
+    def _save_certificate(self, filename, data):
+        started = time.perf_counter()
         c = canvas.Canvas(filename, pagesize=landscape(A4))
+        self._draw_certificate(c, data)
 
-        # Get logo position from data, default to 'left'
-        logo_position = data.get('logo_position', 'left')
-
-    # Outer container background - pure white
-        c.setFillColor(HexColor('#ffffff'))
-        c.rect(0, 0, self.width, self.height, fill=True, stroke=False)
-
-        # Certificate container - inset for border
-        # Custom margins: left 50px, top 50px, right 30px, bottom 80px
-        margin_left = 60
-        margin_top = 31
-        margin_right = 50
-        margin_bottom = 100
-        cert_x = margin_left
-        cert_y = margin_bottom
-        cert_width = self.width - margin_left - margin_right
-        cert_height = self.height - margin_top - margin_bottom
-
-        # Draw certificate with 2px light gray border and white fill
-        c.setFillColorRGB(1, 1, 1)
-        c.setStrokeColor(HexColor('#edeef1'))  # Light gray border
-        c.setLineWidth(2)
-        c.rect(cert_x, cert_y, cert_width, cert_height, fill=True, stroke=True)
-
-        # Background watermark image (exact HTML proportions: 80% size)
-        try:
-            if os.path.exists('images/1717996420665_backImage.png'):
-                back_img = ImageReader('images/1717996420665_backImage.png')
-                back_width = cert_width * 0.8  # Exact HTML: 80%
-                back_height = cert_height * 0.8  # Exact HTML: 80%
-                back_x = cert_x + (cert_width - back_width) / 2
-                back_y = cert_y + (cert_height - back_height) / 2
-                c.saveState()
-                c.setFillAlpha(0.08)  # Light watermark
-                c.drawImage(back_img, back_x, back_y, width=back_width, height=back_height, preserveAspectRatio=True, mask='auto')
-                c.restoreState()
-        except Exception as e:
-            print(f"Background image error: {e}")
-
-        # HmContainer (95% width) with padding - fill more space
-        hm_width = cert_width * 0.95
-        hm_x = cert_x + (cert_width - hm_width) / 2
-        hm_padding = 10  # Reduced padding
-
-        # HmInnerContainer - the bordered area
-        # CSS: padding: 2.5rem (about 36 points) - reduced for more content space
-        inner_padding = 25
-        inner_x = cert_x  # Start from left edge of certificate
-        inner_y = cert_y  # Start from top edge of certificate
-        inner_width = cert_width  # Certificate width
-        inner_height = cert_height
-
-        # All content positions below use inner_x, inner_y, inner_width, inner_height
-
-        # Borders: 2px left, top, bottom (no right) - #edeef1 (exact HTML)
-        c.setStrokeColor(HexColor('#edeef1'))
-        c.setLineWidth(2)
-        # Left border
-        c.line(inner_x, inner_y, inner_x, inner_y + inner_height)
-        # Top border  
-        c.line(inner_x, inner_y + inner_height, inner_x + inner_width, inner_y + inner_height)
-
-        # Content area inside borders - narrow left positioning
-        content_x = inner_x + 30  # Increased left margin by 10px
-        content_y = inner_y + inner_padding
-        content_width = inner_width - (inner_padding * 2) - 100  # Leave space for right frame
-
-        # Start positioning from top
-        current_y = inner_y + inner_height - inner_padding - 10
-
-        # Logo (32px height as per HTML CSS) - narrow left position
-        # Draw logo on the left, aligned with the value (description) section
-        try:
-            if os.path.exists('images/1717996285387_rainlogo.png'):
-                logo_img = ImageReader('images/1717996285387_rainlogo.png')
-                logo_height = 85
-                logo_width = 85
-                # Find the y position of the value (description) section
-                value_y = current_y - 30 - 25 - 5  # Subtract margins after welcome, name, and underline
-                logo_x = content_x  # Align left with value
-                c.drawImage(logo_img, logo_x, value_y, width=logo_width, height=logo_height, preserveAspectRatio=True, mask='auto')
-        except Exception as e:
-            print(f"Logo error: {e}")
-
-        current_y -= 60  # Reduced space after logo
-
-        # Certificate title - CSS: font-size: 2.6rem (39pt), color: #f05d24, line-height: 3.8rem (exact HTML)
-        # HTML: margin-top: 1.2rem; margin-bottom: -10px
-        current_y -= 18  # margin-top: 1.2rem
-        c.setFont(self.font_bold, 30)
-        c.setFillColor(HexColor('#f05d24'))
-        title_text = data['course_title'].upper()
-        c.drawString(content_x, current_y, title_text)
-        
-        current_y -= 25  # Very reduced space to bring welcome text much closer to title
-        
-        # Certificate clarify text - CSS: font-size: 0.9rem (13.5pt), font-weight: 600, width: 40% (exact HTML)
-        c.setFont(self.font_regular, 13.5)  # EB Garamond regular, 0.9rem
-        c.setFillColor(HexColor('#000000'))
-        clarify_text = data['course_sub']
-        # Limit width to 40% as per HTML
-        max_clarify_width = content_width * 0.4
-        if c.stringWidth(clarify_text, self.font_bold, 13.5) > max_clarify_width:
-            # Truncate text if too long
-            while c.stringWidth(clarify_text + "...", self.font_bold, 13.5) > max_clarify_width and len(clarify_text) > 0:
-                clarify_text = clarify_text[:-1]
-            clarify_text += "..."
-        c.drawString(content_x, current_y, clarify_text)
-        
-        current_y -= 15  # Increased bottom margin after welcome text
-        current_y -= 25  # Reduced space to bring name closer
-        
-    # Name - EB Garamond Italic, font-size: 2rem (30pt), color: #0d2344, width: 60%
-        c.setFont(self.font_italic, 30)
-        c.setFillColor(HexColor('#0d2344'))
-        # Capitalize each word
-        name_parts = data['name'].split()
-        formatted_name = ' '.join([part.capitalize() for part in name_parts])
-        
-        # Limit width to 60% as per HTML
-        max_name_width = content_width * 0.6
-        if c.stringWidth(formatted_name, self.font_italic, 30) > max_name_width:
-            # Truncate text if too long (EB Garamond Italic)
-            while c.stringWidth(formatted_name + "...", self.font_italic, 30) > max_name_width and len(formatted_name) > 0:
-                formatted_name = formatted_name[:-1]
-            formatted_name += "..."
-        c.drawString(content_x, current_y, formatted_name)
-        # Add space between name and underline
-        current_y -= 10  # 15px space
-        # Name underline - EB Garamond Regular
-        name_width = c.stringWidth(formatted_name, self.font_regular, 30)
-        underline_width = (name_width * 2.3) # horizontal line width 
-        c.setStrokeColor(HexColor('#0d2344'))
-        c.setLineWidth(1)
-        c.line(content_x, current_y - 6, content_x + underline_width, current_y - 6)
-        current_y -= 35  # Margin after name
-        
-        # Description - CSS: font-size: 0.9rem (13.5pt), font-weight: 500, line-height: 25px (exact HTML)
-        c.setFont(self.font_regular, 11)  # Exact HTML font size (font-weight: 500 = regular)
-        c.setFillColor(HexColor('#000000'))
-        
-        # Word wrap description
-        words = data['value'].split()
-        lines = []
-        current_line = []
-        max_desc_width = content_width * 0.95
-        
-        for word in words:
-            test_line = ' '.join(current_line + [word])
-            if c.stringWidth(test_line, self.font_regular, 11) < max_desc_width:
-                current_line.append(word)
-            else:
-                lines.append(' '.join(current_line))
-                current_line = [word]
-        if current_line:
-            lines.append(' '.join(current_line))
-        
-        # Draw description lines with exact HTML line height
-        line_height = 25  # Exact HTML: line-height: 25px
+        # Save PDF
+        with self._stage('serialize'):
+            c.save()
+        self._end_certificate(started)
+
+    def fingerprint(self):
+        """Digest of everything besides the record that shapes the output"""
+        if self._fingerprint is None:
+            h = hashlib.sha256()
+            h.update(repr((self.use_template, self.strict_signatures, self.images.dpi, self.images.quality,
+                           sorted((name, layout_hash(spec)) for name, spec in self.layouts.items()))).encode('utf-8'))
+            images = sorted({path for plan in self._all_plans() for path in plan.images})
+            for path in LAYOUT_SOURCES + font_files() + images:
+                h.update(f"{path}={file_digest(path)}\n".encode('utf-8'))
+            self._fingerprint = h.hexdigest()
+        return self._fingerprint
+
+    def _all_plans(self):
+        return [get_plan(spec) for spec in self.layouts.values()]
+
+    def render_certificate(self, stream, data):
+        """Render a certificate PDF into a writable binary stream (no files, no output)"""
+        if self.instrumentation is not None:
+            self.instrumentation.begin_certificate()
+        started = time.perf_counter()
+        c = canvas.Canvas(stream, pagesize=landscape(A4))
+        self._draw_certificate(c, data)
+        with self._stage('serialize'):
+            c.save()
+        self._end_certificate(started)
+
+    def render_certificate_bytes(self, data):
+        """Render a certificate PDF in memory and return its bytes"""
+        buffer = BytesIO()
+        self.render_certificate(buffer, data)
+        return buffer.getvalue()
+
+    async def render_certificate_bytes_async(self, data, executor=None):
+        """Awaitable render_certificate_bytes that runs in an executor.
+
+        Rendering is CPU-bound, so an asyncio server should await this rather
+        than render inline; the default executor is the loop's thread pool.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, self.render_certificate_bytes, data)
+
+    def render_preview_bytes(self, data, width=DEFAULT_PREVIEW_WIDTH, format='png', quality=80):
+        """Render a PNG/WebP/JPEG thumbnail of the certificate with Pillow (no PDF involved)"""
+        return render_preview(self, data, width=width, format=format, quality=quality)
+
+    def create_preview(self, filename, data, width=DEFAULT_PREVIEW_WIDTH, format=None, quality=80):
+        """Write a certificate thumbnail; the format defaults to the file extension"""
+        format = format or os.path.splitext(filename)[1].lstrip('.') or 'png'
+        content = self.render_preview_bytes(data, width=width, format=format, quality=quality)
+
+        def write(path):
+            with open(path, 'wb') as f:
+                f.write(content)
+        write_atomically(filename, write)
+        print(f"Preview created: {filename}")
+
+    def create_certificates_document(self, filename, records):
+        """Create one PDF with a certificate page per record.
+
+        Fonts and the static images are embedded once and shared by every page,
+        so this is much smaller and faster than writing one file per record.
+        """
+        c = canvas.Canvas(filename, pagesize=landscape(A4))
+        pages = 0
+        for data in records:
+            if self.instrumentation is not None:
+                self.instrumentation.begin_certificate()
+            started = time.perf_counter()
+            self._draw_certificate(c, data)
+            c.showPage()
+            self._end_certificate(started)
+            pages += 1
+        with self._stage('serialize'):
+            c.save()
+        print(f"Certificate document created: {filename} ({pages} pages)")
+        return pages
+
+    def _stage(self, name):
+        if self.instrumentation is None:
+            return NO_STAGE
+        return self.instrumentation.stage(name)
+
+    def _end_certificate(self, started):
+        if self.instrumentation is not None:
+            self.instrumentation.end_certificate(time.perf_counter() - started)
+
+    def plan(self, data):
+        """Compiled DrawPlan for a record's template and logo_position"""
+        key = (data.get('template') or 'default', data.get('logo_position') or None)
+        plan = self._plans.get(key)
+        if plan is None:
+            if key[0] not in self.layouts:
+                raise ValueError(f"unknown template: {key[0]!r}")
+            plan = self._plans[key] = get_plan(self.layouts[key[0]], key[1])
+        return plan
+
+    def _draw_certificate(self, c, data):
+        """Draw one certificate onto the current page of canvas c"""
+        laps = self.instrumentation.lap_timer() if self.instrumentation is not None else None
+        plan = self.plan(data)
+
+        # Invariant layer: page, border, watermark and logo
+        if self.use_template:
+            self._draw_template(c, plan, 'background', self._draw_background)
+        else:
+            self._draw_background(c, plan)
+        if laps is not None:
+            laps.lap('background')
+
+        self._draw_content(c, plan, data, laps)
+
+        # Right decorative frame, drawn last so it overlaps the content as before
+        if self.use_template:
+            self._draw_template(c, plan, 'frame', self._draw_frame)
+        else:
+            self._draw_frame(c, plan)
+        if laps is not None:
+            laps.lap('frame')
+
+    def _draw_content(self, c, plan, data, laps=None):
+        """Draw the record's text, underline and signature (the per-record layer).
+
+        Only uses setFont, setFillColor, setStrokeColor, setLineWidth,
+        drawString, line and drawImage, so preview.py can replay it with Pillow.
+        """
+        content_x = plan.content_x
+        bottom_y = plan.bottom_y
+
+        # Certificate title
+        style = plan.title
+        c.setFont(ensure_font(style.font), style.size)
+        c.setFillColor(style.color)
+        title_text = data['course_title'].upper() if plan.title_uppercase else data['course_title']
+        c.drawString(content_x, plan.title_y, title_text)
+
+        # Certificate clarify text, limited to its share of the content width
+        style = plan.subtitle
+        c.setFont(ensure_font(style.font), style.size)
+        c.setFillColor(style.color)
+        clarify_text = truncate_text(data['course_sub'], ensure_font(plan.subtitle_measure_font), style.size,
+                                     plan.subtitle_max_width)
+        c.drawString(content_x, plan.subtitle_y, clarify_text)
+
+        # Name, each word capitalized
+        style = plan.name
+        c.setFont(ensure_font(style.font), style.size)
+        c.setFillColor(style.color)
+        formatted_name = ' '.join([part.capitalize() for part in data['name'].split()])
+        formatted_name = truncate_text(formatted_name, style.font, style.size, plan.name_max_width)
+        c.drawString(content_x, plan.name_y, formatted_name)
+        # Name underline, scaled from the name's width
+        name_width = string_width(formatted_name, ensure_font(plan.underline_measure_font), style.size)
+        underline_width = (name_width * plan.underline_scale)
+        c.setStrokeColor(plan.underline_color)
+        c.setLineWidth(plan.underline_width)
+        c.line(content_x, plan.underline_y, content_x + underline_width, plan.underline_y)
+        if laps is not None:
+            laps.lap('title_name')
+
+        # Description, word wrapped
+        style = plan.description
+        c.setFont(ensure_font(style.font), style.size)
+        c.setFillColor(style.color)
+        lines = wrap_text(data['value'], style.font, style.size, plan.description_max_width)
+
+        current_y = plan.description_y
+        line_height = plan.line_height
         for line in lines:
-            if current_y - line_height < cert_y + inner_padding:
+            if current_y - line_height < bottom_y:
                 break  # Prevent overflow
             c.drawString(content_x, current_y, line)
             current_y -= line_height
 
         # Margin after description
-        # Increase margin bottom after value description
-        # Decrease margin bottom after value description by 20px
-        if current_y - 5 < cert_y + inner_padding:
-            current_y = cert_y + inner_padding + 5
+        if current_y - plan.description_margin < bottom_y:
+            current_y = bottom_y + plan.description_margin
         else:
-            current_y -= 5
+            current_y -= plan.description_margin
 
         # Date
-        c.setFont(self.font_bold, 10)
-        c.setFillColor(HexColor('#000000'))
-        date_text = f"Date : {data['date']}"
-        if current_y - 20 < cert_y + inner_padding:
-            current_y = cert_y + inner_padding + 20
+        style = plan.date
+        c.setFont(ensure_font(style.font), style.size)
+        c.setFillColor(style.color)
+        date_text = f"{plan.date_prefix}{data['date']}"
+        if current_y - plan.date_advance < bottom_y:
+            current_y = bottom_y + plan.date_advance
         c.drawString(content_x, current_y, date_text)
-        current_y -= 20
+        current_y -= plan.date_advance
+        if laps is not None:
+            laps.lap('description')
 
         # Signature section
-        sig_x = content_x
-        sig_y = max(current_y, cert_y + inner_padding + 60)
+        sig_y = max(current_y, plan.signature_min_y)
 
         if 'ceo_signature' in data and data['ceo_signature']:
             try:
-                # Align signature left margin with all content
-                sig_left = content_x - 10  # Move CEO signature further left
+                sig_img = self.asset_resolver.get_image(data['ceo_signature'])
+                if laps is not None:
+                    laps.lap('assets')
                 if data['ceo_signature'].startswith('http'):
-                    response = requests.get(data['ceo_signature'])
-                    if response.status_code == 200:
-                        sig_img = ImageReader(BytesIO(response.content))
-                        c.drawImage(sig_img, sig_left, sig_y - 40, width=90, height=50, preserveAspectRatio=True, mask='auto')  # 10px top margin
+                    dx, dy, width, height = plan.signature_remote_box
                 else:
-                    sig_img = ImageReader(data['ceo_signature'])
-                    c.drawImage(sig_img, sig_left, sig_y - 30, width=120, height=40, preserveAspectRatio=True, mask='auto')  # 10px top margin
-            except:
-                pass
-
-        # CEO name
-        ceo_y = sig_y - 50  # Adjust spacing for visual balance
-        c.setFont(self.font_bold, 10)
-        c.setFillColor(HexColor('#000000'))
-        ceo_name = data['ceo_name']
-        spaced_ceo_name = ceo_name.strip()
-        name_x = content_x  # Align with all other items
-        c.drawString(name_x, ceo_y, spaced_ceo_name)
-
-        # CEO title
-        ceo_title_y = ceo_y - 16  # Adjust spacing for visual balance
-        c.setFont(self.font_regular, 10)
-        ceo_title = data['ceo_title']
-        title_x = content_x  # Align with all other items
-        c.drawString(title_x, ceo_title_y, ceo_title)
-        # Add extra white space between CEO title and bottom of certificate
-        current_y = ceo_title_y - 30
-
-        # Draw logo in the bottom middle of the certificate page, parallel to CEO name
-
-        # Right decorative frame - restore previous position (not flush with edge)
+                    dx, dy, width, height = plan.signature_local_box
+                c.drawImage(sig_img, content_x + dx, sig_y + dy, width=width, height=height, preserveAspectRatio=True, mask='auto')
+            except Exception as e:
+                if self.instrumentation is not None:
+                    self.instrumentation.count('signature_errors')
+                if self.strict_signatures:
+                    raise
+                logger.warning("Signature %s not drawn: %s", data['ceo_signature'], e)
+
+        # CEO name and title
+        ceo_y = sig_y - plan.signatory_name_offset
+        style = plan.signatory_name
+        c.setFont(ensure_font(style.font), style.size)
+        c.setFillColor(style.color)
+        c.drawString(content_x, ceo_y, data['ceo_name'].strip())
+
+        style = plan.signatory_title
+        c.setFont(ensure_font(style.font), style.size)
+        c.drawString(content_x, ceo_y - plan.signatory_title_offset, data['ceo_title'])
+
+        if laps is not None:
+            laps.lap('signature')
+
+    def _draw_template(self, c, plan, part, draw):
+        """Draw an invariant layer as a form XObject, defining it once per document"""
+        # Key by layout and asset versions so a changed image gets a new form
+        key = (plan.key, self.images.dpi, self.images.quality, self.images.fingerprint(plan.images))
+        name = f"Cert{part.capitalize()}{hashlib.md5(repr(key).encode('utf-8')).hexdigest()[:12]}"
+        if not c.hasForm(name):
+            c.beginForm(name)
+            draw(c, plan)
+            c.endForm()
+        c.doForm(name)
+
+    def _draw_background(self, c, plan):
+        """White page, bordered container, watermark and logo"""
+        cert = plan.container
+
+        # Outer container background
+        c.setFillColor(plan.page_fill)
+        c.rect(0, 0, plan.width, plan.height, fill=True, stroke=False)
+
+        # Certificate with light gray border and white fill
+        c.setFillColor(plan.container_fill)
+        c.setStrokeColor(plan.border_color)
+        c.setLineWidth(plan.border_width)
+        c.rect(cert.x, cert.y, cert.width, cert.height, fill=True, stroke=True)
+
+        # Background watermark image
+        back = plan.watermark
         try:
-            if os.path.exists('images/1717996469308_frame.png'):
-                frame_img = ImageReader('images/1717996469308_frame.png')
-                frame_height = inner_height
-                frame_width = frame_height * 0.25  # Adjust aspect ratio
-                frame_x = inner_x + inner_width - frame_width  # Move pattern flush to right border
-                frame_y = inner_y
+            if back is not None and self.images.get(back.path) is not None:
+                c.saveState()
+                c.setFillAlpha(plan.watermark_opacity)
+                self.images.draw(c, back.path, back.x, back.y, width=back.width, height=back.height, preserveAspectRatio=True, mask='auto')
+                c.restoreState()
+        except Exception as e:
+            logger.warning("Background image error: %s", e)
+
+        # Borders: left and top (no right)
+        c.setStrokeColor(plan.border_color)
+        c.setLineWidth(plan.border_width)
+        c.line(cert.x, cert.y, cert.x, cert.y + cert.height)
+        c.line(cert.x, cert.y + cert.height, cert.x + cert.width, cert.y + cert.height)
+
+        # Logo, at the layout's (or record's) logo_position
+        logo = plan.logo
+        try:
+            if logo is not None and self.images.get(logo.path) is not None:
+                self.images.draw(c, logo.path, logo.x, logo.y, width=logo.width, height=logo.height, preserveAspectRatio=True, mask='auto')
+        except Exception as e:
+            logger.warning("Logo error: %s", e)
+
+    def _draw_frame(self, c, plan):
+        """Right decorative frame, clipped to the certificate container"""
+        frame = plan.frame
+        cert = plan.container
+        try:
+            if frame is not None and self.images.get(frame.path) is not None:
                 c.saveState()
                 clip_path = c.beginPath()
-                clip_path.rect(cert_x, cert_y, cert_width, cert_height)
+                clip_path.rect(cert.x, cert.y, cert.width, cert.height)
                 c.clipPath(clip_path, stroke=0, fill=0)
-                c.drawImage(frame_img, frame_x, frame_y, width=frame_width, height=frame_height, preserveAspectRatio=True, mask='auto')
+                self.images.draw(c, frame.path, frame.x, frame.y, width=frame.width, height=frame.height, preserveAspectRatio=True, mask='auto')
                 c.restoreState()
         except Exception as e:
-            print(f"Frame image error: {e}")
+            logger.warning("Frame image error: %s", e)
 
-        # Right decorative frame - positioned at right edge of inner container (exact HTML)
-        # Clip the frame pattern to the certificate area using a path object
-            # Right decorative frame - only the latest pattern, flush with right border
-            try:
-                if os.path.exists('images/1717996469308_frame.png'):
-                    frame_img = ImageReader('images/1717996469308_frame.png')
-                    frame_height = inner_height
-                    frame_width = frame_height * 0.25  # Adjust aspect ratio
-                    frame_x = inner_x + inner_width - frame_width  # Flush with right border
-                    frame_y = inner_y
-                    c.saveState()
-                    clip_path = c.beginPath()
-                    clip_path.rect(cert_x, cert_y, cert_width, cert_height)
-                    c.clipPath(clip_path, stroke=0, fill=0)
-                    c.drawImage(frame_img, frame_x, frame_y, width=frame_width, height=frame_height, preserveAspectRatio=True, mask='auto')
-                    c.restoreState()
-            except Exception as e:
-                print(f"Frame image error: {e}")
-        
-        # Save PDF
-        c.save()
-        print(f"Certificate created: {filename}")
\ No newline at end of file
+
+def _prefixed(prefix, stats):
+    return {prefix + name: value for name, value in stats.items()}
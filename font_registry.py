@@ -0,0 +1,92 @@
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+import threading
+from weakref import WeakKeyDictionary
+
+import reportlab
+from reportlab import rl_config
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTEncoding, TTFont
+
+FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'font')
+
+# Registered font name -> TTF file in FONT_DIR
+FONT_FACES = {
+    'EBGaramond': 'EBGaramond-Regular.ttf',
+    'EBGaramond-Bold': 'EBGaramond-Bold.ttf',
+    'EBGaramond-Italic': 'EBGaramond-Italic.ttf',
+}
+
+# Optional directory for pickled, pre-parsed font faces (or set CERT_FONT_CACHE)
+metrics_cache_dir = os.environ.get('CERT_FONT_CACHE') or None
+
+_registered = set()
+_lock = threading.Lock()
+
+
+def font_path(name):
+    return os.path.join(FONT_DIR, FONT_FACES[name])
+
+
+def font_files():
+    return [font_path(name) for name in FONT_FACES]
+
+
+def ensure_font(name):
+    """Register a font face on first use and return its name.
+
+    Parsing happens once per process however many generators are created;
+    later calls are a set lookup. A missing font file raises instead of
+    leaving an unregistered name to fail later at setFont.
+    """
+    if name in _registered:
+        return name
+    with _lock:
+        if name not in _registered:
+            pdfmetrics.registerFont(_load_font(name))
+            _registered.add(name)
+    return name
+
+
+def _load_font(name):
+    path = font_path(name)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"font file for {name!r} not found: {path}")
+    if not metrics_cache_dir:
+        return TTFont(name, path)
+
+    st = os.stat(path)
+    key = hashlib.sha256(repr((path, st.st_size, st.st_mtime, reportlab.Version,
+                               sys.version_info[:2])).encode('utf-8')).hexdigest()[:16]
+    cache_path = os.path.join(metrics_cache_dir, f"{name}-{key}.pickle")
+    try:
+        with open(cache_path, 'rb') as f:
+            return _font_from_face(name, pickle.load(f))
+    except Exception:
+        pass  # missing or unreadable cache entry: parse the TTF instead
+
+    font = TTFont(name, path)
+    try:
+        os.makedirs(metrics_cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=metrics_cache_dir, prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(font.face, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass  # the cache is only an optimisation
+    return font
+
+
+def _font_from_face(name, face):
+    # Mirrors TTFont.__init__ with an already parsed face; the cache key
+    # includes the reportlab version so this stays in step with it
+    font = TTFont.__new__(TTFont)
+    font.fontName = name
+    font.face = face
+    font.encoding = TTEncoding()
+    font.state = WeakKeyDictionary()
+    font._asciiReadable = rl_config.ttfAsciiReadable
+    return font
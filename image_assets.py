@@ -0,0 +1,309 @@
+import copy
+import math
+import os
+import threading
+import time
+from io import BytesIO
+
+from reportlab.lib.boxstuff import aspectRatioFix
+from reportlab.lib.utils import ImageReader, _digester
+from reportlab.pdfbase.pdfdoc import (PDFArray, PDFDictionary, PDFImageXObject, PDFName, PDFObjectReference,
+                                      PDFStream)
+
+
+class _ImageAsset:
+    __slots__ = ('path', 'mtime', 'checked_at', 'reader', 'xobjects')
+
+    def __init__(self, path, mtime, reader):
+        self.path = path
+        self.mtime = mtime
+        self.checked_at = time.time()
+        self.reader = reader
+        # mask or (mask, pixel width, pixel height) -> (name, encoded image XObject, encoded soft mask or None)
+        self.xobjects = {}
+
+
+# (dpi, quality) -> the ImageAssetRegistry shared by every generator in this process
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_registry(dpi=None, quality=85):
+    """The process-wide ImageAssetRegistry for these settings, created on first use"""
+    key = (dpi, quality)
+    registry = _shared.get(key)
+    if registry is None:
+        with _shared_lock:
+            registry = _shared.get(key)
+            if registry is None:
+                registry = _shared[key] = ImageAssetRegistry(dpi=dpi, quality=quality)
+    return registry
+
+
+class ImageAssetRegistry:
+    """Cache of the static certificate images; shared_registry() hands out one per process.
+
+    Each image is decoded once, keyed by path and mtime, and its PDF image
+    XObject (the zlib-compressed pixel stream plus soft mask) is encoded
+    once. draw() registers a copy of the pre-encoded XObject with each new
+    canvas, so later certificates skip both the PNG decode and the
+    compression that canvas.drawImage would otherwise redo per document.
+    Files are re-stat'ed at most every check_interval seconds.
+
+    With dpi set, images are instead resampled to the size they are drawn
+    at (never upscaled), alpha is dropped when fully opaque, and the colour
+    data is stored as JPEG at the given quality when that beats Flate.
+    Each drawn size is encoded once and cached like the full-size image.
+    """
+
+    def __init__(self, check_interval=2.0, dpi=None, quality=85):
+        self.check_interval = check_interval
+        self.dpi = dpi
+        self.quality = quality
+        self._assets = {}
+        self._lock = threading.RLock()
+        self.stats = {'hits': 0, 'loads': 0, 'variants': 0}
+
+    def preload(self, paths, mask='auto'):
+        for path in paths:
+            asset = self._asset(path)
+            if asset is not None and not self.dpi:
+                self._encoded(asset, mask)
+
+    def get(self, path):
+        """Decoded ImageReader for path, or None when the file is missing"""
+        asset = self._asset(path)
+        return asset.reader if asset is not None else None
+
+    def fingerprint(self, paths):
+        """(path, mtime) pairs identifying the current version of each image"""
+        fingerprint = []
+        for path in paths:
+            asset = self._asset(path)
+            fingerprint.append((path, asset.mtime if asset is not None else None))
+        return tuple(fingerprint)
+
+    def draw(self, c, path, x, y, width=None, height=None, mask='auto',
+             preserveAspectRatio=False, anchor='c'):
+        """canvas.drawImage() for a registry image; returns False if it is missing"""
+        asset = self._asset(path)
+        if asset is None:
+            return False
+        src_width, src_height = asset.reader.getSize()
+        x, y, width, height, scaled = aspectRatioFix(preserveAspectRatio, anchor, x, y, width, height,
+                                                     src_width, src_height)
+        if self.dpi:
+            name, image, smask = self._optimized(asset, mask, width, height)
+        else:
+            name, image, smask = self._encoded(asset, mask)
+
+        doc = c._doc
+        reg_name = doc.getXObjectName(name)
+        img_obj = doc.idToObject.get(reg_name)
+        if img_obj is None:
+            # First use in this document: register a copy of the encoded template
+            img_obj = copy.copy(image)
+            c._setXObjects(img_obj)
+            doc.Reference(img_obj, reg_name)
+            doc.addForm(name, img_obj)
+            if smask is not None:
+                mask_reg_name = doc.getXObjectName(smask.name)
+                if mask_reg_name in doc.idToObject:
+                    img_obj.smask = PDFObjectReference(mask_reg_name)
+                else:
+                    mask_obj = copy.copy(smask)
+                    c._setXObjects(mask_obj)
+                    img_obj.smask = doc.Reference(mask_obj, mask_reg_name)
+
+        # Same placement and drawing operators as canvas.drawImage
+        c._currentPageHasImages = 1
+        c.saveState()
+        c.translate(x, y)
+        c.scale(width, height)
+        c._code.append("/%s Do" % reg_name)
+        c.restoreState()
+        c._formsinuse.append(name)
+        return True
+
+    def memory_usage(self):
+        """Approximate bytes held per image: decoded pixels and encoded streams"""
+        usage = {}
+        with self._lock:
+            for path, asset in self._assets.items():
+                if asset.reader is None:
+                    continue
+                reader = asset.reader
+                decoded = len(reader._data or b'')
+                if reader._dataA is not None:
+                    decoded += len(reader._dataA._data or b'')
+                encoded = 0
+                for name, image, smask in asset.xobjects.values():
+                    encoded += len(image.streamContent)
+                    if smask is not None:
+                        encoded += len(smask.streamContent)
+                usage[path] = {'decoded': decoded, 'encoded': encoded, 'total': decoded + encoded}
+        return usage
+
+    def total_memory(self):
+        return sum(item['total'] for item in self.memory_usage().values())
+
+    def clear(self):
+        with self._lock:
+            self._assets.clear()
+
+    def _asset(self, path):
+        now = time.time()
+        with self._lock:
+            asset = self._assets.get(path)
+            if asset is None or now - asset.checked_at >= self.check_interval:
+                try:
+                    mtime = os.stat(path).st_mtime
+                except OSError:
+                    mtime = None
+                if asset is not None and asset.mtime == mtime:
+                    asset.checked_at = now
+                    self.stats['hits'] += 1
+                else:
+                    self.stats['loads'] += 1
+                    reader = None
+                    if mtime is not None:
+                        reader = ImageReader(path)
+                        reader.getRGBData()  # decode now so every later certificate shares the pixels
+                    asset = self._assets[path] = _ImageAsset(path, mtime, reader)
+            else:
+                self.stats['hits'] += 1
+            return asset if asset.reader is not None else None
+
+    def _encoded(self, asset, mask):
+        key = str(mask)
+        with self._lock:
+            encoded = asset.xobjects.get(key)
+            if encoded is None:
+                reader = asset.reader
+                rawdata = reader.getRGBData()
+                if mask == 'auto' and reader._dataA:
+                    mdata = reader._dataA.getRGBData()
+                else:
+                    mdata = str(mask).encode('utf8')
+                name = _digester(rawdata + mdata)
+                image = PDFImageXObject(name, reader, mask=mask)
+                image.name = name
+                smask = image.__dict__.pop('_smask', None)
+                encoded = asset.xobjects[key] = (name, image, smask)
+            return encoded
+
+    def _optimized(self, asset, mask, width, height):
+        # Pixel size for the drawn size at self.dpi, capped at the source size
+        src_width, src_height = asset.reader.getSize()
+        pixels = (min(src_width, max(1, math.ceil(abs(width) * self.dpi / 72.0))),
+                  min(src_height, max(1, math.ceil(abs(height) * self.dpi / 72.0))))
+        encoded = self._variant(asset, mask, pixels)
+        if pixels != (src_width, src_height):
+            # Resampled line art can compress worse than the original pixels
+            full = self._variant(asset, mask, (src_width, src_height))
+            if _encoded_size(full) <= _encoded_size(encoded):
+                encoded = full
+        return encoded
+
+    def _variant(self, asset, mask, pixels):
+        key = (str(mask),) + pixels
+        with self._lock:
+            encoded = asset.xobjects.get(key)
+            if encoded is None:
+                encoded = asset.xobjects[key] = self._encode_variant(asset, mask, pixels)
+                self.stats['variants'] += 1
+            return encoded
+
+    def _encode_variant(self, asset, mask, pixels):
+        from PIL import Image
+
+        im = asset.reader._image
+        if im.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            im = im.convert('RGBA' if 'A' in im.getbands() or 'transparency' in im.info else 'RGB')
+        if im.size != pixels:
+            im = im.resize(pixels, Image.LANCZOS)
+        alpha = None
+        if im.mode in ('RGBA', 'LA'):
+            if mask == 'auto' and im.getchannel('A').getextrema() != (255, 255):
+                alpha = im.getchannel('A')
+            im = im.convert(im.mode[:-1])  # fully opaque (or no soft mask wanted)
+
+        name = _digester(f"{asset.path}:{asset.mtime}:{mask}:{pixels}:{self.quality}".encode('utf8'))
+        image = _png_xobject(name, im)
+        if isinstance(mask, (list, tuple)):
+            image.mask = mask  # colour-key masks need exact colours, so no JPEG
+        else:
+            jpeg = _jpeg_xobject(name, im, self.quality)
+            if len(jpeg.streamContent) < len(image.streamContent):
+                image = jpeg
+        smask = None
+        if alpha is not None:
+            smask = _png_xobject(_digester(alpha.tobytes() + repr(pixels).encode('utf8')), alpha)
+        return name, image, smask
+
+
+class _OptimizedImageXObject(PDFImageXObject):
+    """Image XObject holding an already encoded binary stream (no ASCII85), with optional DecodeParms"""
+
+    def __init__(self, name, width, height, color_space, filters, content, decode_parms=None):
+        self.name = name
+        self.width = width
+        self.height = height
+        self.bitsPerComponent = 8
+        self.colorSpace = color_space
+        self._filters = filters
+        self.streamContent = content
+        self.decodeParms = decode_parms
+        self.mask = None
+
+    def format(self, document):
+        S = PDFStream(content=self.streamContent)
+        d = S.dictionary
+        d["Type"] = PDFName("XObject")
+        d["Subtype"] = PDFName("Image")
+        d["Width"] = self.width
+        d["Height"] = self.height
+        d["BitsPerComponent"] = self.bitsPerComponent
+        d["ColorSpace"] = PDFName(self.colorSpace)
+        d["Filter"] = PDFArray(map(PDFName, self._filters))
+        if self.decodeParms:
+            d["DecodeParms"] = PDFArray([PDFDictionary(self.decodeParms)])
+        d["Length"] = len(self.streamContent)
+        if self.mask:
+            d["Mask"] = PDFArray(self.mask)
+        if getattr(self, 'smask', None):
+            d["SMask"] = self.smask
+        return S.format(document)
+
+
+def _encoded_size(encoded):
+    name, image, smask = encoded
+    return len(image.streamContent) + (len(smask.streamContent) if smask is not None else 0)
+
+
+def _png_xobject(name, im):
+    # Flate with PNG row predictors: the IDAT data of a PNG is exactly such a stream
+    buf = BytesIO()
+    im.save(buf, 'PNG', optimize=True)
+    data = buf.getvalue()
+    idat = []
+    pos = 8
+    while pos < len(data):
+        length = int.from_bytes(data[pos:pos + 4], 'big')
+        if data[pos + 4:pos + 8] == b'IDAT':
+            idat.append(data[pos + 8:pos + 8 + length])
+        pos += length + 12
+    colors = 1 if im.mode == 'L' else 3
+    return _OptimizedImageXObject(name, im.width, im.height, _COLOR_SPACES[im.mode], ('FlateDecode',),
+                                  b''.join(idat), {'Predictor': 15, 'Colors': colors,
+                                                   'BitsPerComponent': 8, 'Columns': im.width})
+
+
+def _jpeg_xobject(name, im, quality):
+    buf = BytesIO()
+    im.save(buf, 'JPEG', quality=quality, optimize=True)
+    return _OptimizedImageXObject(name, im.width, im.height, _COLOR_SPACES[im.mode], ('DCTDecode',),
+                                  buf.getvalue())
+
+
+_COLOR_SPACES = {'RGB': 'DeviceRGB', 'L': 'DeviceGray'}
@@ -0,0 +1,160 @@
+import json
+import time
+from contextlib import nullcontext
+
+# Shared do-nothing context manager for when instrumentation is disabled
+NO_STAGE = nullcontext()
+
+
+class _StageTimer:
+    __slots__ = ('instrumentation', 'name', 'started')
+
+    def __init__(self, instrumentation, name):
+        self.instrumentation = instrumentation
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.instrumentation.record_stage(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class _LapTimer:
+    """Times consecutive stages: each lap(name) records the time since the previous lap"""
+    __slots__ = ('instrumentation', 'last')
+
+    def __init__(self, instrumentation):
+        self.instrumentation = instrumentation
+        self.last = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.instrumentation.record_stage(name, now - self.last)
+        self.last = now
+
+
+class Instrumentation:
+    """Opt-in per-stage timers, counters and hooks for certificate rendering.
+
+    Pass one to CertificateGenerator(instrumentation=...). Stage timings are
+    accumulated (count, total, max) and also kept for the certificate in
+    progress in `current`. Hooks are called as hook(event, name, value) with
+    event 'stage', 'count' or 'certificate'. Counter sources are callables
+    returning cumulative counters (e.g. cache stats) that snapshot() folds in.
+    """
+
+    def __init__(self):
+        self.hooks = []
+        self.sources = []
+        self.stages = {}
+        self.counters = {}
+        self.certificates = 0
+        self.current = {}
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def add_source(self, source):
+        self.sources.append(source)
+
+    def stage(self, name):
+        return _StageTimer(self, name)
+
+    def lap_timer(self):
+        return _LapTimer(self)
+
+    def record_stage(self, name, seconds):
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = [0, 0.0, 0.0]
+        stats[0] += 1
+        stats[1] += seconds
+        if seconds > stats[2]:
+            stats[2] = seconds
+        self.current[name] = self.current.get(name, 0.0) + seconds
+        for hook in self.hooks:
+            hook('stage', name, seconds)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+        for hook in self.hooks:
+            hook('count', name, n)
+
+    def begin_certificate(self):
+        self.current = {}
+
+    def end_certificate(self, seconds):
+        self.certificates += 1
+        self.record_stage('total', seconds)
+        for hook in self.hooks:
+            hook('certificate', 'total', seconds)
+
+    def read_counters(self):
+        counters = dict(self.counters)
+        for source in self.sources:
+            for name, value in source().items():
+                counters[name] = counters.get(name, 0) + value
+        return counters
+
+    def merge_record(self, timings, counters):
+        """Fold one certificate's stage timings and counter deltas into these totals (batch aggregation)"""
+        if 'total' in timings:
+            self.certificates += 1
+        for name, seconds in timings.items():
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = [0, 0.0, 0.0]
+            stats[0] += 1
+            stats[1] += seconds
+            if seconds > stats[2]:
+                stats[2] = seconds
+        for name, value in counters.items():
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self):
+        return {
+            'certificates': self.certificates,
+            'stages': {
+                name: {'count': count, 'total_sec': total, 'max_sec': peak, 'mean_sec': total / count if count else 0.0}
+                for name, (count, total, peak) in self.stages.items()
+            },
+            'counters': self.read_counters(),
+        }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.snapshot(), **kwargs)
+
+    def to_prometheus(self, prefix='certificate'):
+        """Snapshot in the Prometheus text exposition format"""
+        snap = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_rendered_total Certificates rendered.",
+            f"# TYPE {prefix}_rendered_total counter",
+            f"{prefix}_rendered_total {snap['certificates']}",
+            f"# HELP {prefix}_stage_seconds_total Time spent per rendering stage.",
+            f"# TYPE {prefix}_stage_seconds_total counter",
+        ]
+        for name, stats in sorted(snap['stages'].items()):
+            lines.append(f'{prefix}_stage_seconds_total{{stage="{name}"}} {stats["total_sec"]:.6f}')
+        lines += [
+            f"# HELP {prefix}_stage_calls_total Times each rendering stage ran.",
+            f"# TYPE {prefix}_stage_calls_total counter",
+        ]
+        for name, stats in sorted(snap['stages'].items()):
+            lines.append(f'{prefix}_stage_calls_total{{stage="{name}"}} {stats["count"]}')
+        lines += [
+            f"# HELP {prefix}_stage_seconds_max Slowest single run of each rendering stage.",
+            f"# TYPE {prefix}_stage_seconds_max gauge",
+        ]
+        for name, stats in sorted(snap['stages'].items()):
+            lines.append(f'{prefix}_stage_seconds_max{{stage="{name}"}} {stats["max_sec"]:.6f}')
+        lines += [
+            f"# HELP {prefix}_events_total Cache hits/misses, network fetches and other counters.",
+            f"# TYPE {prefix}_events_total counter",
+        ]
+        for name, value in sorted(snap['counters'].items()):
+            lines.append(f'{prefix}_events_total{{event="{name}"}} {value}')
+        return '\n'.join(lines) + '\n'
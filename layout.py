@@ -0,0 +1,240 @@
+import copy
+import hashlib
+import json
+import os
+import re
+from collections import namedtuple
+
+from reportlab.lib.colors import HexColor
+from reportlab.lib.pagesizes import A4, landscape
+
+from font_registry import FONT_FACES
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+LOGO_POSITIONS = ('left', 'right', 'center')
+
+# The certificate design as data. Offsets are in points; 'offset' values are
+# measured down from the element above, ratios are of the content width.
+# Image paths are relative to this package. A template only needs to give
+# the values it changes; the rest come from here.
+DEFAULT_LAYOUT = {
+    # Layout box: A4 landscape less these trims (the PDF page stays A4)
+    'page': {'width_trim': 0, 'height_trim': 30, 'fill': '#ffffff'},
+    'container': {
+        'margin_left': 60, 'margin_top': 31, 'margin_right': 50, 'margin_bottom': 100,
+        'padding': 25, 'fill': '#ffffff', 'border_color': '#edeef1', 'border_width': 2,
+    },
+    # content_x = container x + left; width = container width - 2 * padding - right
+    'content': {'left': 30, 'right': 100, 'top': 10},
+    'watermark': {'image': 'images/1717996420665_backImage.png', 'scale': 0.8, 'opacity': 0.08},
+    'logo': {'image': 'images/1717996285387_rainlogo.png', 'width': 85, 'height': 85, 'offset': 60,
+             'position': 'left'},
+    'frame': {'image': 'images/1717996469308_frame.png', 'width_ratio': 0.25},
+    'title': {'font': 'EBGaramond-Bold', 'size': 30, 'color': '#f05d24', 'offset': 18, 'uppercase': True},
+    # The subtitle has always been truncated as if it were set in bold
+    'subtitle': {'font': 'EBGaramond', 'measure_font': 'EBGaramond-Bold', 'size': 13.5, 'color': '#000000',
+                 'offset': 25, 'max_width': 0.4},
+    'name': {'font': 'EBGaramond-Italic', 'size': 30, 'color': '#0d2344', 'offset': 40, 'max_width': 0.6},
+    'underline': {'measure_font': 'EBGaramond', 'scale': 2.3, 'color': '#0d2344', 'width': 1, 'offset': 16},
+    'description': {'font': 'EBGaramond', 'size': 11, 'color': '#000000', 'offset': 45, 'max_width': 0.95,
+                    'line_height': 25, 'margin_after': 5},
+    'date': {'font': 'EBGaramond-Bold', 'size': 10, 'color': '#000000', 'prefix': 'Date : ', 'advance': 20},
+    # Signature image boxes relative to (content x, signature line); URLs and files differ
+    'signature': {'min_height': 60, 'remote_box': [-10, -40, 90, 50], 'local_box': [-10, -30, 120, 40]},
+    'signatory': {'name_font': 'EBGaramond-Bold', 'title_font': 'EBGaramond', 'size': 10, 'color': '#000000',
+                  'name_offset': 50, 'title_offset': 16},
+}
+
+TextStyle = namedtuple('TextStyle', 'font size color')
+ImageBox = namedtuple('ImageBox', 'path x y width height')
+Rect = namedtuple('Rect', 'x y width height')
+
+# Everything about a certificate that does not depend on the record
+DrawPlan = namedtuple('DrawPlan', [
+    'key', 'page_size', 'width', 'height', 'page_fill',
+    'container', 'container_fill', 'border_color', 'border_width',
+    'watermark', 'watermark_opacity', 'logo', 'frame', 'images',
+    'content_x', 'bottom_y',
+    'title', 'title_y', 'title_uppercase',
+    'subtitle', 'subtitle_y', 'subtitle_max_width', 'subtitle_measure_font',
+    'name', 'name_y', 'name_max_width',
+    'underline_color', 'underline_width', 'underline_y', 'underline_scale', 'underline_measure_font',
+    'description', 'description_y', 'description_max_width', 'line_height', 'description_margin',
+    'date', 'date_prefix', 'date_advance',
+    'signature_min_y', 'signature_remote_box', 'signature_local_box',
+    'signatory_name', 'signatory_title', 'signatory_name_offset', 'signatory_title_offset',
+])
+
+_COLOR = re.compile(r'^#[0-9a-fA-F]{6}$')
+
+# (spec hash, logo position) -> DrawPlan
+_plans = {}
+
+
+def load_layout(path):
+    """Read a layout spec from a JSON file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def resolve_layout(spec):
+    """DEFAULT_LAYOUT with spec's sections merged over it"""
+    layout = copy.deepcopy(DEFAULT_LAYOUT)
+    for section, values in (spec or {}).items():
+        if isinstance(values, dict) and isinstance(layout.get(section), dict):
+            layout[section].update(values)
+        else:
+            layout[section] = values
+    return layout
+
+
+def validate_layout(layout):
+    """Raise ValueError listing every problem in a resolved layout"""
+    problems = []
+    for section, values in layout.items():
+        defaults = DEFAULT_LAYOUT.get(section)
+        if defaults is None:
+            problems.append(f"unknown section {section!r}")
+            continue
+        if not isinstance(values, dict):
+            problems.append(f"{section} must be an object")
+            continue
+        for key, value in values.items():
+            where = f"{section}.{key}"
+            if key not in defaults:
+                problems.append(f"unknown setting {where}")
+            elif key == 'image':
+                if value is not None and not isinstance(value, str):
+                    problems.append(f"{where} must be a path or null")
+            elif key.endswith('font'):
+                if value not in FONT_FACES:
+                    problems.append(f"{where}: unknown font {value!r}")
+            elif key.endswith('color') or key == 'fill':
+                if not isinstance(value, str) or not _COLOR.match(value):
+                    problems.append(f"{where} must be a #rrggbb color")
+            elif key.endswith('_box'):
+                if not (isinstance(value, (list, tuple)) and len(value) == 4 and all(_is_number(v) for v in value)):
+                    problems.append(f"{where} must be [dx, dy, width, height]")
+            elif isinstance(defaults[key], bool):
+                if not isinstance(value, bool):
+                    problems.append(f"{where} must be true or false")
+            elif _is_number(defaults[key]):
+                if not _is_number(value):
+                    problems.append(f"{where} must be a number")
+            elif not isinstance(value, str):
+                problems.append(f"{where} must be a string")
+    logo = layout.get('logo')
+    if isinstance(logo, dict) and logo.get('position') not in LOGO_POSITIONS:
+        problems.append(f"logo.position must be one of {', '.join(LOGO_POSITIONS)}, not {logo.get('position')!r}")
+    if problems:
+        raise ValueError("invalid layout: " + '; '.join(problems))
+
+
+def layout_hash(spec):
+    """Stable digest of a spec, as resolved against DEFAULT_LAYOUT"""
+    canonical = json.dumps(resolve_layout(spec), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def get_plan(spec=None, logo_position=None):
+    """Compiled DrawPlan for spec, built once per distinct spec and logo position"""
+    key = (layout_hash(spec), logo_position)
+    plan = _plans.get(key)
+    if plan is None:
+        layout = resolve_layout(spec)
+        if logo_position is not None:
+            layout['logo']['position'] = logo_position
+        plan = _plans[key] = compile_layout(layout)
+    return plan
+
+
+def compile_layout(layout):
+    """Validate a resolved layout and precompute its coordinates and colors.
+
+    Fonts stay names; the drawing code registers each face on first use.
+    """
+    validate_layout(layout)
+    page, box, content = layout['page'], layout['container'], layout['content']
+    page_size = landscape(A4)
+    width = page_size[0] - page['width_trim']
+    height = page_size[1] - page['height_trim']
+
+    cert_x = box['margin_left']
+    cert_y = box['margin_bottom']
+    cert_width = width - box['margin_left'] - box['margin_right']
+    cert_height = height - box['margin_top'] - box['margin_bottom']
+    padding = box['padding']
+    content_x = cert_x + content['left']
+    content_width = cert_width - padding * 2 - content['right']
+    top_y = cert_y + cert_height - padding - content['top']
+
+    watermark = None
+    if layout['watermark']['image']:
+        scale = layout['watermark']['scale']
+        back_width, back_height = cert_width * scale, cert_height * scale
+        watermark = ImageBox(_image_path(layout['watermark']['image']),
+                             cert_x + (cert_width - back_width) / 2, cert_y + (cert_height - back_height) / 2,
+                             back_width, back_height)
+
+    logo = None
+    spec = layout['logo']
+    if spec['image']:
+        logo_x = content_x
+        if spec['position'] == 'right':
+            logo_x = content_x + content_width - spec['width']
+        elif spec['position'] == 'center':
+            logo_x = content_x + (content_width - spec['width']) / 2
+        logo = ImageBox(_image_path(spec['image']), logo_x, top_y - spec['offset'], spec['width'], spec['height'])
+
+    frame = None
+    if layout['frame']['image']:
+        frame_width = cert_height * layout['frame']['width_ratio']
+        frame = ImageBox(_image_path(layout['frame']['image']), cert_x + cert_width - frame_width, cert_y,
+                         frame_width, cert_height)
+
+    title_y = top_y - layout['logo']['offset'] - layout['title']['offset']
+    subtitle_y = title_y - layout['subtitle']['offset']
+    name_y = subtitle_y - layout['name']['offset']
+    signatory = layout['signatory']
+    images = tuple(item.path for item in (watermark, logo, frame) if item is not None)
+
+    return DrawPlan(
+        key=layout_hash(layout),
+        page_size=page_size, width=width, height=height, page_fill=HexColor(page['fill']),
+        container=Rect(cert_x, cert_y, cert_width, cert_height), container_fill=HexColor(box['fill']),
+        border_color=HexColor(box['border_color']), border_width=box['border_width'],
+        watermark=watermark, watermark_opacity=layout['watermark']['opacity'], logo=logo, frame=frame,
+        images=images,
+        content_x=content_x, bottom_y=cert_y + padding,
+        title=_style(layout['title']), title_y=title_y, title_uppercase=layout['title']['uppercase'],
+        subtitle=_style(layout['subtitle']), subtitle_y=subtitle_y,
+        subtitle_max_width=content_width * layout['subtitle']['max_width'],
+        subtitle_measure_font=layout['subtitle']['measure_font'],
+        name=_style(layout['name']), name_y=name_y, name_max_width=content_width * layout['name']['max_width'],
+        underline_color=HexColor(layout['underline']['color']), underline_width=layout['underline']['width'],
+        underline_y=name_y - layout['underline']['offset'], underline_scale=layout['underline']['scale'],
+        underline_measure_font=layout['underline']['measure_font'],
+        description=_style(layout['description']), description_y=name_y - layout['description']['offset'],
+        description_max_width=content_width * layout['description']['max_width'],
+        line_height=layout['description']['line_height'], description_margin=layout['description']['margin_after'],
+        date=_style(layout['date']), date_prefix=layout['date']['prefix'], date_advance=layout['date']['advance'],
+        signature_min_y=cert_y + padding + layout['signature']['min_height'],
+        signature_remote_box=tuple(layout['signature']['remote_box']),
+        signature_local_box=tuple(layout['signature']['local_box']),
+        signatory_name=TextStyle(signatory['name_font'], signatory['size'], HexColor(signatory['color'])),
+        signatory_title=TextStyle(signatory['title_font'], signatory['size'], HexColor(signatory['color'])),
+        signatory_name_offset=signatory['name_offset'], signatory_title_offset=signatory['title_offset'],
+    )
+
+
+def _style(section):
+    return TextStyle(section['font'], section['size'], HexColor(section['color']))
+
+
+def _image_path(path):
+    return path if os.path.isabs(path) else os.path.join(BASE_DIR, path)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
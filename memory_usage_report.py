@@ -1,20 +1,26 @@
 import os
-import psutil
+import tempfile
 import tracemalloc
 from certificate_generator import CertificateGenerator
+from benchmark import make_fixture_signature, make_records
 
 def main():
-    import test_single
+    # Local fixture signature so the report does not depend on the network
+    workdir = tempfile.mkdtemp(prefix='cert-memory-')
+    certificate_data = make_records(1, make_fixture_signature(workdir))[0]
+
     tracemalloc.start()
     snapshot_before = tracemalloc.take_snapshot()
     print("Memory snapshot taken before certificate generation.")
-    # Run test_single.py logic (generates certificate)
-    # test_single.py will execute on import
+    generator = CertificateGenerator()
+    generator.create_certificate(os.path.join(workdir, 'certificate.pdf'), certificate_data)
     snapshot_after = tracemalloc.take_snapshot()
     print("Memory snapshot taken after certificate generation.")
     stats = snapshot_after.compare_to(snapshot_before, 'filename')
     total_alloc = sum([stat.size_diff for stat in stats])
+    _, peak = tracemalloc.get_traced_memory()
     print(f"Total memory allocated during certificate generation: {total_alloc} bytes ({total_alloc/1024:.2f} KB)")
+    print(f"Peak traced memory: {peak} bytes ({peak/1024:.2f} KB)")
     tracemalloc.stop()
 
 if __name__ == "__main__":
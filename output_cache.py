@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+
+def file_digest(path):
+    """sha256 of a file's contents, or None if it does not exist"""
+    h = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+    except FileNotFoundError:
+        return None
+    return h.hexdigest()
+
+
+class OutputCache:
+    """Content-addressed cache of rendered certificate PDFs.
+
+    Entries are keyed by a hash of the record and a fingerprint of everything
+    else that affects the output (layout code, fonts, images, the signature's
+    content). A hit is
+    hard-linked (or copied, with link=False) into place instead of being
+    re-rendered. Hits refresh the entry's mtime and the oldest entries are
+    evicted once the cache grows past max_bytes. Output files are always
+    replaced via rename, never rewritten in place, so a hard-linked output
+    can never corrupt the cached copy it shares an inode with.
+    """
+
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3, link=True):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.link = link
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        # Running size estimate; only a full scan in evict() is authoritative,
+        # since other processes may share the directory
+        self._size = None
+
+    def key(self, data, fingerprint):
+        record = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(f"{fingerprint}\n{record}".encode('utf-8')).hexdigest()
+
+    def get_or_create(self, key, filename, render):
+        """Put the certificate for key at filename; returns True on a cache hit.
+
+        On a miss render(path) must write the PDF to path; the result is
+        moved into place and added to the cache.
+        """
+        entry = self._entry_path(key)
+        if os.path.exists(entry):
+            try:
+                if not (os.path.exists(filename) and os.path.samefile(entry, filename)):
+                    self._place(entry, filename)
+                os.utime(entry)
+                self.hits += 1
+                return True
+            except FileNotFoundError:
+                pass  # evicted by another process in the meantime
+        self.misses += 1
+
+        write_atomically(filename, render)
+        self._store(entry, filename)
+        return False
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits max_bytes"""
+        entries = []
+        total = 0
+        for root, dirs, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            _remove(path)
+            total -= size
+        self._size = total
+        return total
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.pdf')
+
+    def _place(self, source, filename):
+        tmp_path = _temp_path(filename)
+        _remove(tmp_path)
+        try:
+            self._link_or_copy(source, tmp_path)
+            os.replace(tmp_path, filename)
+        except BaseException:
+            _remove(tmp_path)
+            raise
+
+    def _store(self, entry, filename):
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        tmp_path = _temp_path(entry)
+        _remove(tmp_path)
+        try:
+            self._link_or_copy(filename, tmp_path)
+            os.replace(tmp_path, entry)
+        except OSError:
+            _remove(tmp_path)
+            return
+        if self._size is None:
+            self.evict()
+        else:
+            self._size += os.path.getsize(entry)
+            if self._size > self.max_bytes:
+                self.evict()
+
+    def _link_or_copy(self, source, target):
+        if self.link:
+            try:
+                os.link(source, target)
+                return
+            except OSError:
+                pass  # different filesystem or no hard link support
+        shutil.copyfile(source, target)
+
+
+def write_atomically(filename, render):
+    """Call render(path) on a temp file next to filename, then rename it into place.
+
+    Readers never see a half-written PDF, and a failed render leaves any
+    previous file untouched.
+    """
+    tmp_path = _temp_path(filename)
+    try:
+        render(tmp_path)
+        os.replace(tmp_path, filename)
+    except BaseException:
+        _remove(tmp_path)
+        raise
+
+
+def _temp_path(path):
+    # Created like open() would (0666 less the umask), not mkstemp's 0600, since
+    # the rename keeps the mode and outputs must stay readable by other users
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    while True:
+        tmp_path = os.path.join(directory, f".tmp-{uuid.uuid4().hex}.pdf")
+        try:
+            os.close(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666))
+            return tmp_path
+        except FileExistsError:
+            continue
+
+
+def _remove(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,195 @@
+import hashlib
+import io
+import os
+import tarfile
+import time
+import zipfile
+
+
+def safe_name(name):
+    """File name without directory parts, so a record can't write outside the sink"""
+    name = name.replace('/', '_').replace('\\', '_').strip()
+    return name if name not in ('', '.', '..') else 'certificate'
+
+
+class _UniqueNames:
+    # Hands out each name once per sink: a repeat becomes name-1.ext, name-2.ext, ...
+    def __init__(self):
+        self.taken = set()
+
+    def claim(self, name):
+        if name in self.taken:
+            stem, ext = os.path.splitext(name)
+            n = 1
+            while f"{stem}-{n}{ext}" in self.taken:
+                n += 1
+            name = f"{stem}-{n}{ext}"
+        self.taken.add(name)
+        return name
+
+
+class DirectorySink:
+    """Writes each certificate to its own file in one directory.
+
+    Names are made unique within a run (a second 'sachin_kumar_certificate.pdf'
+    becomes 'sachin_kumar_certificate-1.pdf') instead of overwriting. Workers
+    write the files themselves; the sink only assigns paths. A rerun reuses
+    the same names, so it replaces the previous run's files.
+    """
+    streaming = False
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self._names = _UniqueNames()
+        os.makedirs(out_dir, exist_ok=True)
+
+    def reserve(self, name):
+        """Path the certificate called name should be written to"""
+        return os.path.join(self.out_dir, self._names.claim(safe_name(name)))
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class ShardedDirectorySink(DirectorySink):
+    """DirectorySink spreading files over hashed subdirectories.
+
+    sha1(name) picks `levels` nested two-hex-digit directories (256 per
+    level), e.g. out/3f/a2/sachin_kumar_certificate.pdf, so no directory
+    grows past a few thousand entries even for 500k certificates. The path
+    of a name is stable between runs.
+    """
+
+    def __init__(self, out_dir, levels=2):
+        super().__init__(out_dir)
+        self.levels = levels
+        self._made = set()
+
+    def reserve(self, name):
+        name = self._names.claim(safe_name(name))
+        digest = hashlib.sha1(name.encode('utf-8')).hexdigest()
+        directory = os.path.join(self.out_dir, *(digest[2 * i:2 * i + 2] for i in range(self.levels)))
+        if directory not in self._made:
+            os.makedirs(directory, exist_ok=True)
+            self._made.add(directory)
+        return os.path.join(directory, name)
+
+
+class _ArchiveSink:
+    # Streaming sinks: workers return the rendered bytes and the parent appends
+    # them to one archive, written to a temp file and renamed into place on close().
+    # Every run writes a complete new archive, so runs can't be resumed into one
+    streaming = True
+
+    def __init__(self, path):
+        self.path = path
+        self._names = _UniqueNames()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._tmp_path = os.path.join(directory, f".tmp-{os.getpid()}-{os.path.basename(path)}")
+        self._closed = False
+
+    def reserve(self, name):
+        """Member name the certificate called name will be stored under"""
+        return self._names.claim(safe_name(name))
+
+    def write(self, name, content):
+        """Append one reserved member; returns its location as 'archive#member'"""
+        self._add(name, content)
+        return f"{self.path}#{name}"
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._finish()
+            os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        """Discard the partial archive"""
+        if not self._closed:
+            self._closed = True
+            try:
+                self._finish()
+            finally:
+                try:
+                    os.unlink(self._tmp_path)
+                except FileNotFoundError:
+                    pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+class ZipSink(_ArchiveSink):
+    """Streams certificates into a ZIP archive.
+
+    PDFs are already compressed, so members are stored by default; pass
+    compression=zipfile.ZIP_DEFLATED for previews or other compressible output.
+    """
+
+    def __init__(self, path, compression=zipfile.ZIP_STORED):
+        super().__init__(path)
+        self.compression = compression
+        self._zip = zipfile.ZipFile(self._tmp_path, 'w', compression=compression, allowZip64=True)
+
+    def _add(self, name, content):
+        info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        info.compress_type = self.compression
+        info.external_attr = 0o644 << 16
+        self._zip.writestr(info, content)
+
+    def _finish(self):
+        self._zip.close()
+
+
+class TarSink(_ArchiveSink):
+    """Streams certificates into a tar archive; compression is '', 'gz', 'bz2' or 'xz'"""
+
+    def __init__(self, path, compression=''):
+        super().__init__(path)
+        self._tar = tarfile.open(self._tmp_path, 'w|' + compression)
+
+    def _add(self, name, content):
+        info = tarfile.TarInfo(name)
+        info.size = len(content)
+        info.mtime = int(time.time())
+        info.mode = 0o644
+        self._tar.addfile(info, io.BytesIO(content))
+
+    def _finish(self):
+        self._tar.close()
+
+
+# Tar file suffix -> TarSink compression
+TAR_SUFFIXES = (('.tar', ''), ('.tar.gz', 'gz'), ('.tgz', 'gz'), ('.tar.bz2', 'bz2'), ('.tar.xz', 'xz'))
+
+
+def is_archive(target):
+    """True if open_sink would stream into an archive at target"""
+    lower = target.lower()
+    return lower.endswith('.zip') or any(lower.endswith(suffix) for suffix, _ in TAR_SUFFIXES)
+
+
+def open_sink(target, sharded=False):
+    """Sink for a CLI-style target: .zip / .tar[.gz|.bz2|.xz] files become archives, anything else a directory"""
+    lower = target.lower()
+    if lower.endswith('.zip'):
+        return ZipSink(target)
+    for suffix, compression in TAR_SUFFIXES:
+        if lower.endswith(suffix):
+            return TarSink(target, compression)
+    return ShardedDirectorySink(target) if sharded else DirectorySink(target)
@@ -0,0 +1,196 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from io import BytesIO
+
+from PIL import Image, ImageDraw, ImageFont
+from reportlab.lib.boxstuff import aspectRatioFix
+
+from font_registry import font_path
+
+DEFAULT_WIDTH = 1024
+MAX_WIDTH = 4096
+
+# Background/frame layers kept per process; each is a full-size image
+MAX_CACHED_LAYERS = 8
+
+# File extension / format argument -> Pillow format name
+FORMATS = {'png': 'PNG', 'webp': 'WEBP', 'jpg': 'JPEG', 'jpeg': 'JPEG'}
+
+# (layout key, image versions, width) -> (background image, (frame image, position) or None)
+_layers = OrderedDict()
+_lock = threading.Lock()
+
+
+def render_preview(generator, data, width=DEFAULT_WIDTH, format='png', quality=80):
+    """Rasterize a certificate with Pillow and return the encoded image bytes.
+
+    The page, border, watermark, logo and frame come from a per-process cache
+    keyed by layout and width; per record only the text and signature are
+    drawn, by replaying the generator's own _draw_content on a Pillow-backed
+    canvas, so coordinates, fonts and truncation match the PDF.
+    """
+    pil_format = FORMATS.get(format.lower())
+    if pil_format is None:
+        raise ValueError(f"unsupported preview format: {format!r}")
+    if not isinstance(width, int) or not 0 < width <= MAX_WIDTH:
+        raise ValueError(f"preview width must be an integer from 1 to {MAX_WIDTH}, not {width!r}")
+    instrumentation = generator.instrumentation
+    if instrumentation is not None:
+        instrumentation.begin_certificate()
+    laps = instrumentation.lap_timer() if instrumentation is not None else None
+    started = time.perf_counter()
+    plan = generator.plan(data)
+    background, frame = _cached_layers(generator, plan, width)
+    scale = width / plan.page_size[0]
+
+    image = background.copy()
+    if laps is not None:
+        laps.lap('background')
+    generator._draw_content(_PreviewCanvas(image, scale, plan.page_size[1]), plan, data, laps)
+    if frame is not None:
+        frame_image, position = frame
+        image.paste(frame_image, position, frame_image)
+    if laps is not None:
+        laps.lap('frame')
+
+    buffer = BytesIO()
+    with generator._stage('encode'):
+        if pil_format == 'PNG':
+            image.save(buffer, pil_format)
+        else:
+            image.save(buffer, pil_format, quality=quality)
+    generator._end_certificate(started)
+    return buffer.getvalue()
+
+
+def _cached_layers(generator, plan, width):
+    # Small LRU: callers may pass many distinct widths, and each entry is a full image
+    key = (plan.key, generator.images.fingerprint(plan.images), width)
+    with _lock:
+        layers = _layers.get(key)
+        if layers is None:
+            layers = _layers[key] = _draw_layers(generator.images, plan, width)
+            while len(_layers) > MAX_CACHED_LAYERS:
+                _layers.popitem(last=False)
+        else:
+            _layers.move_to_end(key)
+    return layers
+
+
+def _draw_layers(images, plan, width):
+    """The invariant layers: an RGB background and the frame as a clipped RGBA overlay"""
+    scale = width / plan.page_size[0]
+    page_height = plan.page_size[1]
+    image = Image.new('RGB', (width, round(page_height * scale)), 'white')
+    canvas = _PreviewCanvas(image, scale, page_height)
+    cert = plan.container
+
+    canvas.setFillColor(plan.page_fill)
+    canvas.rect(0, 0, plan.width, plan.height)
+    canvas.setFillColor(plan.container_fill)
+    canvas.setStrokeColor(plan.border_color)
+    canvas.setLineWidth(plan.border_width)
+    canvas.rect(cert.x, cert.y, cert.width, cert.height, stroke=True)
+    for item, opacity in ((plan.watermark, plan.watermark_opacity), (plan.logo, 1)):
+        if item is not None and images.get(item.path) is not None:
+            canvas.drawImage(images.get(item.path), item.x, item.y, item.width, item.height,
+                             preserveAspectRatio=True, mask='auto', opacity=opacity)
+    canvas.line(cert.x, cert.y, cert.x, cert.y + cert.height)
+    canvas.line(cert.x, cert.y + cert.height, cert.x + cert.width, cert.y + cert.height)
+
+    overlay = None
+    frame = plan.frame
+    if frame is not None and images.get(frame.path) is not None:
+        placed = canvas.place(images.get(frame.path), frame.x, frame.y, frame.width, frame.height,
+                              preserveAspectRatio=True)
+        if placed is not None:
+            # Clip to the certificate container, as the PDF does
+            frame_image, (left, top) = placed
+            clip = canvas.box(cert.x, cert.y, cert.width, cert.height)
+            crop = (max(left, clip[0]), max(top, clip[1]),
+                    min(left + frame_image.width, clip[2]), min(top + frame_image.height, clip[3]))
+            if crop[0] < crop[2] and crop[1] < crop[3]:
+                frame_image = frame_image.crop((crop[0] - left, crop[1] - top, crop[2] - left, crop[3] - top))
+                overlay = (frame_image, (crop[0], crop[1]))
+    return image, overlay
+
+
+@lru_cache(maxsize=64)
+def _font(name, pixels):
+    # Basic layout: no complex-script shaping needed, and no dependency on libraqm
+    return ImageFont.truetype(font_path(name), pixels, layout_engine=ImageFont.Layout.BASIC)
+
+
+def _rgb(color):
+    return tuple(int(round(value * 255)) for value in color.rgb())
+
+
+class _PreviewCanvas:
+    """The subset of the reportlab canvas API the certificate drawing uses, on a Pillow image.
+
+    Coordinates are PDF points from the bottom-left of the page.
+    """
+
+    def __init__(self, image, scale, page_height):
+        self.image = image
+        self.scale = scale
+        self.page_height = page_height
+        self.draw = ImageDraw.Draw(image)
+        self.font = None
+        self.fill = (0, 0, 0)
+        self.stroke = (0, 0, 0)
+        self.line_width = 1
+
+    def point(self, x, y):
+        return round(x * self.scale), round((self.page_height - y) * self.scale)
+
+    def box(self, x, y, width, height):
+        left, bottom = self.point(x, y)
+        right, top = self.point(x + width, y + height)
+        return left, top, right, bottom
+
+    def setFont(self, name, size):
+        self.font = _font(name, max(1, round(size * self.scale)))
+
+    def setFillColor(self, color):
+        self.fill = _rgb(color)
+
+    def setStrokeColor(self, color):
+        self.stroke = _rgb(color)
+
+    def setLineWidth(self, width):
+        self.line_width = width
+
+    def drawString(self, x, y, text):
+        self.draw.text(self.point(x, y), text, font=self.font, fill=self.fill, anchor='ls')
+
+    def line(self, x1, y1, x2, y2):
+        self.draw.line([self.point(x1, y1), self.point(x2, y2)], fill=self.stroke,
+                       width=max(1, round(self.line_width * self.scale)))
+
+    def rect(self, x, y, width, height, stroke=False):
+        self.draw.rectangle(self.box(x, y, width, height), fill=self.fill,
+                            outline=self.stroke if stroke else None,
+                            width=max(1, round(self.line_width * self.scale)) if stroke else 0)
+
+    def place(self, reader, x, y, width, height, preserveAspectRatio=False, anchor='c', opacity=1):
+        """Resampled RGBA image and its top-left pixel for drawImage's placement"""
+        source = reader._image
+        x, y, width, height, scaled = aspectRatioFix(preserveAspectRatio, anchor, x, y, width, height,
+                                                     *source.size)
+        left, top, right, bottom = self.box(x, y, width, height)
+        if right <= left or bottom <= top:
+            return None
+        image = source.convert('RGBA').resize((right - left, bottom - top), Image.LANCZOS)
+        if opacity < 1:
+            image.putalpha(image.getchannel('A').point(lambda a: round(a * opacity)))
+        return image, (left, top)
+
+    def drawImage(self, reader, x, y, width=None, height=None, mask=None, preserveAspectRatio=False,
+                  anchor='c', opacity=1):
+        placed = self.place(reader, x, y, width, height, preserveAspectRatio, anchor, opacity)
+        if placed is not None:
+            image, position = placed
+            self.image.paste(image, position, image if mask is not None else None)
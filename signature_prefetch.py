@@ -0,0 +1,90 @@
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from itertools import islice
+
+from asset_resolver import is_transient_error
+
+logger = logging.getLogger(__name__)
+
+
+def signature_urls(records):
+    """Distinct remote ceo_signature URLs in records, in first-seen order"""
+    urls = {}
+    for data in records:
+        source = data.get('ceo_signature') if isinstance(data, dict) else None
+        if isinstance(source, str) and source.startswith('http'):
+            urls[source] = None
+    return list(urls)
+
+
+def _fetch_with_retries(resolver, url, retries, backoff, decode=True):
+    # Connection errors, timeouts and 5xx are retried; 4xx and bad images are final
+    for attempt in range(retries + 1):
+        try:
+            if decode:
+                resolver.get_image(url)
+            else:
+                resolver.fetch_bytes(url)
+            return None
+        except Exception as e:
+            if attempt == retries or not is_transient_error(e):
+                return e
+        time.sleep(backoff * 2 ** attempt)
+
+
+def prefetch_signatures(records, resolver, max_workers=8, retries=2, backoff=0.5):
+    """Download and decode every distinct remote signature in records concurrently.
+
+    The decoded images land in resolver's memory LRU (enlarged to hold them
+    all) and its disk cache, so rendering afterwards does no network I/O.
+    Returns {url: None or the exception that made it fail}.
+    """
+    urls = signature_urls(records)
+    if not urls:
+        return {}
+    resolver.memory_items = max(resolver.memory_items, len(urls))
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as pool:
+        futures = {url: pool.submit(_fetch_with_retries, resolver, url, retries, backoff) for url in urls}
+    return {url: future.result() for url, future in futures.items()}
+
+
+def prefetched(records, resolver, window=256, max_workers=8, retries=2, backoff=0.5, record=None,
+               decode=True):
+    """Yield records once their signatures are fetched, prefetching one window ahead.
+
+    records is consumed lazily in windows; the signatures of the next window
+    download concurrently while the current one is being rendered. Failed
+    fetches are logged and left for the renderer to handle. For items that
+    wrap a record, record(item) returns the record. With decode=False only
+    the bytes are fetched into the disk cache, for renderers in other
+    processes that don't share resolver's memory.
+    """
+    records = iter(records)
+    seen = set()
+    ahead = deque()
+    if decode:
+        resolver.memory_items = max(resolver.memory_items, 2 * window)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while True:
+            while len(ahead) < 2:
+                chunk = list(islice(records, window))
+                if not chunk:
+                    break
+                futures = {}
+                for url in signature_urls(map(record, chunk) if record else chunk):
+                    if url not in seen:
+                        seen.add(url)
+                        futures[url] = pool.submit(_fetch_with_retries, resolver, url, retries, backoff,
+                                                    decode)
+                ahead.append((chunk, futures))
+            if not ahead:
+                return
+            chunk, futures = ahead.popleft()
+            wait(futures.values())
+            for url, future in futures.items():
+                error = future.result()
+                if error is not None:
+                    logger.warning("Could not prefetch signature %s: %s", url, error)
+            yield from chunk
@@ -0,0 +1,127 @@
+"""AssetResolver against a local HTTP stand-in server (no network).
+
+    python -m pytest test_asset_resolver.py
+"""
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+import pytest
+import requests
+from PIL import Image
+
+from asset_resolver import AssetResolver, is_transient_error
+
+
+def _png(color):
+    buffer = BytesIO()
+    Image.new('RGB', (40, 20), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Serves server.files with strong ETags; records every request's status
+    def do_GET(self):
+        content = self.server.files.get(self.path)
+        if content is None:
+            status = 404
+        elif self.headers.get('If-None-Match') == _etag(content):
+            status = 304
+        else:
+            status = 200
+        self.server.log.append((self.path, status))
+        self.send_response(status)
+        if status == 200:
+            self.send_header('ETag', _etag(content))
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+        else:
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def _etag(content):
+    return '"' + hashlib.sha256(content).hexdigest()[:16] + '"'
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    httpd.files = {'/sig.png': _png('red')}
+    httpd.log = []
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_fetch_then_disk_cache(server, tmp_path):
+    url = server.url + '/sig.png'
+    resolver = AssetResolver(cache_dir=str(tmp_path))
+    assert resolver.fetch_bytes(url) == server.files['/sig.png']
+    assert server.log == [('/sig.png', 200)]
+
+    # A new resolver (e.g. a pool worker) is served from the shared disk cache
+    other = AssetResolver(cache_dir=str(tmp_path))
+    assert other.fetch_bytes(url) == server.files['/sig.png']
+    assert other.stats['disk_hits'] == 1
+    assert len(server.log) == 1
+
+
+def test_stale_entry_revalidates_with_304(server, tmp_path):
+    url = server.url + '/sig.png'
+    resolver = AssetResolver(cache_dir=str(tmp_path), max_age=0)
+    first = resolver.fetch_bytes(url)
+    assert resolver.fetch_bytes(url) == first
+    assert server.log == [('/sig.png', 200), ('/sig.png', 304)]
+    assert resolver.stats['revalidated'] == 1
+
+
+def test_changed_content_is_refetched(server, tmp_path):
+    url = server.url + '/sig.png'
+    resolver = AssetResolver(cache_dir=str(tmp_path), max_age=0)
+    before = resolver.content_digest(url)
+    server.files['/sig.png'] = _png('blue')
+    assert resolver.fetch_bytes(url) == server.files['/sig.png']
+    assert resolver.content_digest(url) != before
+
+
+def test_missing_asset_raises_and_is_not_transient(server, tmp_path):
+    resolver = AssetResolver(cache_dir=str(tmp_path))
+    with pytest.raises(requests.HTTPError) as info:
+        resolver.fetch_bytes(server.url + '/missing.png')
+    assert info.value.response.status_code == 404
+    assert not is_transient_error(info.value)
+    assert not os.path.exists(os.path.join(str(tmp_path), 'objects'))
+
+
+def test_tampered_blob_is_a_miss(server, tmp_path):
+    url = server.url + '/sig.png'
+    resolver = AssetResolver(cache_dir=str(tmp_path))
+    content = resolver.fetch_bytes(url)
+    blob = resolver._blob_path(hashlib.sha256(content).hexdigest())
+    with open(blob, 'wb') as f:
+        f.write(_png('green'))
+
+    other = AssetResolver(cache_dir=str(tmp_path))
+    assert other.fetch_bytes(url) == content
+    assert other.stats['disk_hits'] == 0
+    assert len(server.log) == 2
+
+
+def test_get_image_decodes_once(server, tmp_path):
+    url = server.url + '/sig.png'
+    resolver = AssetResolver(cache_dir=str(tmp_path))
+    reader = resolver.get_image(url)
+    assert reader.getSize() == (40, 20)
+    assert resolver.get_image(url) is reader
+    assert resolver.stats['memory_hits'] == 1
+    assert len(server.log) == 1
@@ -0,0 +1,75 @@
+"""text_layout against the original stringWidth loops it replaced.
+
+    python -m pytest test_text_layout.py
+"""
+import random
+
+import pytest
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from font_registry import FONT_FACES, ensure_font
+from text_layout import string_width, truncate_text, wrap_text
+
+WORDS = ['a', 'of', 'the', 'WorkTRADE', 'Insider', 'Trading', 'SEBI', 'completed', 'commendable.',
+         'information.', 'Ünïcödé', 'naïve', 'façade', '—', '(SEBI)', 'x' * 40, 'W' * 25, 'Ångström']
+CASES = 1000
+
+
+def original_wrap(text, font, size, max_width):
+    words = text.split()
+    lines = []
+    current_line = []
+    for word in words:
+        test_line = ' '.join(current_line + [word])
+        if stringWidth(test_line, font, size) < max_width:
+            current_line.append(word)
+        else:
+            lines.append(' '.join(current_line))
+            current_line = [word]
+    if current_line:
+        lines.append(' '.join(current_line))
+    return lines
+
+
+def original_truncate(text, font, size, max_width):
+    if stringWidth(text, font, size) > max_width:
+        while stringWidth(text + "...", font, size) > max_width and len(text) > 0:
+            text = text[:-1]
+        text += "..."
+    return text
+
+
+def _random_text(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(0, 60)))
+
+
+@pytest.mark.parametrize('font', sorted(FONT_FACES))
+def test_wrap_matches_original(font):
+    ensure_font(font)
+    rng = random.Random(f"wrap-{font}")
+    for _ in range(CASES):
+        text = _random_text(rng)
+        size = rng.choice([9, 10, 11, 13.5, 30])
+        max_width = rng.uniform(20, 700)
+        assert wrap_text(text, font, size, max_width) == original_wrap(text, font, size, max_width), \
+            (text, size, max_width)
+
+
+@pytest.mark.parametrize('font', sorted(FONT_FACES))
+def test_truncate_matches_original(font):
+    ensure_font(font)
+    rng = random.Random(f"truncate-{font}")
+    for _ in range(CASES):
+        text = _random_text(rng)[:rng.randint(0, 200)]
+        size = rng.choice([10, 13.5, 30])
+        max_width = rng.uniform(0, 600)
+        assert truncate_text(text, font, size, max_width) == original_truncate(text, font, size, max_width), \
+            (text, size, max_width)
+
+
+def test_string_width_is_exact():
+    font = ensure_font('EBGaramond')
+    rng = random.Random('width')
+    for _ in range(CASES):
+        text = _random_text(rng)
+        assert string_width(text, font, 11) == stringWidth(text, font, 11)
@@ -0,0 +1,109 @@
+from bisect import bisect_right
+from itertools import accumulate
+
+from reportlab.pdfbase import pdfmetrics
+
+# Keep per-measurer word caches from growing without bound on huge batches
+MAX_CACHED_WORDS = 20000
+
+_measurers = {}
+
+
+class TextMeasurer:
+    """Cached string widths for one font at one size.
+
+    Glyph widths are looked up once per character and word widths once per
+    word, both in font units (1/1000 em). Widths are summed in font units and
+    scaled exactly like pdfmetrics.stringWidth does, so results match
+    canvas.stringWidth bit for bit.
+    """
+
+    def __init__(self, font_name, font_size):
+        self.font_name = font_name
+        self.font_size = font_size
+        self._font = pdfmetrics.getFont(font_name)
+        self._glyphs = {}
+        self._words = {}
+
+    def units(self, text):
+        """Width of text in font units"""
+        units = self._words.get(text)
+        if units is None:
+            units = sum(self._glyph_units(text))
+            if len(self._words) >= MAX_CACHED_WORDS:
+                self._words.clear()
+            self._words[text] = units
+        return units
+
+    def width(self, text):
+        return self.points(self.units(text))
+
+    def points(self, units):
+        return 0.001 * self.font_size * units
+
+    def _glyph_units(self, text):
+        glyphs = self._glyphs
+        widths = []
+        for ch in text:
+            w = glyphs.get(ch)
+            if w is None:
+                w = glyphs[ch] = self._font.stringWidth(ch, 1000)
+            widths.append(w)
+        return widths
+
+    def wrap(self, text, max_width):
+        """Greedy word wrap: a word joins the line while the line stays under max_width"""
+        space = self.units(' ')
+        lines = []
+        current_line = []
+        line_units = 0
+        for word in text.split():
+            test_units = line_units + (space if current_line else 0) + self.units(word)
+            if self.points(test_units) < max_width:
+                current_line.append(word)
+                line_units = test_units
+            else:
+                # Like the original loop, an over-wide first word yields an empty line
+                lines.append(' '.join(current_line))
+                current_line = [word]
+                line_units = self.units(word)
+        if current_line:
+            lines.append(' '.join(current_line))
+        return lines
+
+    def truncate(self, text, max_width, ellipsis='...'):
+        """Longest prefix of text that fits with ellipsis, or text itself if it fits"""
+        if self.width(text) <= max_width:
+            return text
+        # Prefix widths are monotonic, so binary search the longest one that fits
+        ellipsis_units = self.units(ellipsis)
+        prefix_units = list(accumulate(self._glyph_units(text), initial=0))
+        limit = max_width / (0.001 * self.font_size)
+        n = bisect_right(prefix_units, limit - ellipsis_units) - 1
+        # Settle the boundary with the exact stringWidth arithmetic
+        while n > 0 and self.points(prefix_units[n] + ellipsis_units) > max_width:
+            n -= 1
+        while n + 1 < len(prefix_units) and self.points(prefix_units[n + 1] + ellipsis_units) <= max_width:
+            n += 1
+        return text[:max(n, 0)] + ellipsis
+
+
+def get_measurer(font_name, font_size):
+    """Shared TextMeasurer for (font_name, font_size), reused across certificates"""
+    key = (font_name, font_size)
+    measurer = _measurers.get(key)
+    if measurer is None:
+        measurer = _measurers[key] = TextMeasurer(font_name, font_size)
+    return measurer
+
+
+def string_width(text, font_name, font_size):
+    return get_measurer(font_name, font_size).width(text)
+
+
+def wrap_text(text, font_name, font_size, max_width):
+    return get_measurer(font_name, font_size).wrap(text, max_width)
+
+
+def truncate_text(text, font_name, font_size, max_width, ellipsis='...'):
+    return get_measurer(font_name, font_size).truncate(text, max_width, ellipsis)